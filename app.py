@@ -1,60 +1,125 @@
-from flask import Flask
+import os
+
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from serving import pool_modules, pool_settings
+from services.admission import AdmissionRejected
+from services.deadline import DeadlineExceeded, init_deadlines
+from services.lazy_loader import LazyDispatcher
+from services.memory import MemoryBudgetError
+from services.metrics import init_metrics, render_metrics
+from services.profiling import admin_authorized, init_profiling, list_profiles, load_profile
+from services.scratch import init_scratch, scratch_usage
+from services.uploads import MAX_UPLOAD_BYTES, SpooledRequest, UploadLimitError
+
+# Route modules: (module in routes/, blueprint attribute, URL prefixes).
+# Modules are imported on first request for one of their prefixes, so
+# heavy dependencies load only in pods that actually serve those routes.
+ROUTE_MODULES = [
+    ("scan_document", "scan_doc_bp", ["/scan", "/scan-batch", "/detect-corners"]),
+    ("merge_pdf", "merge_pdf_bp", ["/merge-pdf"]),
+    ("ocr", "ocr_bp", ["/ocr", "/tesseract-check"]),
+    ("split", "split_pdf_bp", ["/split-pdf"]),
+    ("compress", "compress_bp", ["/compress-pdf"]),
+    ("ocr_pdf", "ocr_pdf_bp", ["/ocr-pdf"]),
+    ("delete_pages", "delete_pages_bp", ["/delete-pages"]),
+    ("extract_pages", "extract_pages_bp", ["/extract-pages"]),
+    ("organize_pdf", "organize_pdf_bp", ["/organize-pdf"]),
+    ("rotate_pdf", "rotate_pdf_bp", ["/rotate-pdf"]),
+    ("add_page_numbers", "add_page_numbers_bp", ["/add-page-numbers"]),
+    ("edit_pdf", "edit_pdf_bp", ["/edit-pdf", "/extract-text-ocr", "/get-pdf-image"]),
+    ("add_watermark", "add_watermark_bp", ["/add-watermark"]),
+    ("crop_pdf", "crop_pdf_bp", ["/crop-pdf"]),
+    ("compress_image", "compress_image_bp", ["/compress-image"]),
+    ("image_to_pdf", "image_to_pdf_bp", ["/image-to-pdf"]),
+    ("excel_to_pdf", "excel_to_pdf_bp", ["/excel-to-pdf"]),
+    ("word_to_pdf", "word_to_pdf_bp", ["/word-to-pdf"]),
+    ("ppt_to_pdf", "ppt_to_pdf_bp", ["/ppt-to-pdf"]),
+    # ("html_to_pdf", "html_to_pdf_bp", ["/html-to-pdf"]),
+    ("pdfa_ocr", "pdfa_ocr_bp", ["/pdfa-ocr"]),
+    ("thumbnails", "thumbnails_bp", ["/thumbnails"]),
+    ("inspect_pdf", "inspect_pdf_bp", ["/inspect-pdf"]),
+]
+
+# eager: import everything at startup (best with gunicorn preload)
+# background: import in a thread after the worker starts
+# lazy: import on first request only
+LAZY_IMPORTS = os.environ.get("LAZY_IMPORTS", "background").lower()
+
+
+def create_app(blueprints=()):
+    """Flask app with the shared upload, scratch and error-handling setup"""
+    app = Flask(__name__)
+    CORS(app)
+
+    # ✅ Uploads spool to disk above a threshold; hard cap on request size
+    app.request_class = SpooledRequest
+    app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+
+    # ✅ Per-request scratch directories, cleaned after the response closes
+    init_scratch(app)
+
+    # ✅ Request count, latency and input size for /metrics
+    init_metrics(app)
+
+    # ✅ Opt-in sampling profiler (X-Profile header or PROFILE_SAMPLE_RATE)
+    init_profiling(app)
+
+    # ✅ Per-request time budget inherited by subprocesses (REQUEST_DEADLINE)
+    init_deadlines(app, default=pool_settings()["timeout"])
+
+    # ✅ IMPORTANT: Prevent 308 redirects due to trailing slash
+    app.url_map.strict_slashes = False
+
+    @app.errorhandler(RequestEntityTooLarge)
+    def upload_too_large(e):
+        return {"error": f"Upload too large; the limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"}, 413
+
+    @app.errorhandler(UploadLimitError)
+    def upload_limit_exceeded(e):
+        return {"error": str(e)}, 413
 
-from routes.scan_document import scan_doc_bp
-from routes.merge_pdf import merge_pdf_bp
-from routes.ocr import ocr_bp
-from routes.split import split_pdf_bp
-from routes.compress import compress_bp
-from routes.ocr_pdf import ocr_pdf_bp
-from routes.delete_pages import delete_pages_bp
-from routes.extract_pages import extract_pages_bp
-from routes.organize_pdf import organize_pdf_bp
-from routes.rotate_pdf import rotate_pdf_bp
-from routes.add_page_numbers import add_page_numbers_bp
-from routes.edit_pdf import edit_pdf_bp
-from routes.add_watermark import add_watermark_bp
-from routes.crop_pdf import crop_pdf_bp
-from routes.compress_image import compress_image_bp
-from routes.image_to_pdf import image_to_pdf_bp
-from routes.excel_to_pdf import excel_to_pdf_bp
-from routes.word_to_pdf import word_to_pdf_bp
-from routes.ppt_to_pdf import ppt_to_pdf_bp
-# from routes.html_to_pdf import html_to_pdf_bp
-from routes.pdfa_ocr import pdfa_ocr_bp
-
-app = Flask(__name__)
-CORS(app)
+    @app.errorhandler(MemoryBudgetError)
+    def memory_budget_exceeded(e):
+        return {"error": str(e)}, 413
+
+    @app.errorhandler(DeadlineExceeded)
+    def deadline_exceeded(e):
+        print(f"Deadline exceeded on {request.method} {request.path}: {e}")
+        return {
+            "error": "Processing timed out",
+            "details": str(e),
+            "step": e.step,
+            "deadline_seconds": e.budget,
+        }, 504
+
+    @app.errorhandler(AdmissionRejected)
+    def admission_rejected(e):
+        return {"error": str(e), "resource": e.resource}, 503, {"Retry-After": str(e.retry_after)}
+
+    for blueprint in blueprints:
+        app.register_blueprint(blueprint)
+
+    return app
+
+
+app = create_app()
+
+# Only the route classes this serving pool handles
+dispatcher = LazyDispatcher(
+    app.wsgi_app,
+    lambda blueprints: create_app(blueprints).wsgi_app,
+    [r for r in ROUTE_MODULES if r[0] in pool_modules()],
+)
 
 # ✅ IMPORTANT: Fix HTTPS detection behind Railway proxy
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# ✅ IMPORTANT: Prevent 308 redirects due to trailing slash
-app.url_map.strict_slashes = False
-
-# Register Blueprints
-app.register_blueprint(scan_doc_bp)
-app.register_blueprint(merge_pdf_bp)
-app.register_blueprint(ocr_bp)
-app.register_blueprint(split_pdf_bp)
-app.register_blueprint(compress_bp)
-app.register_blueprint(ocr_pdf_bp)
-app.register_blueprint(delete_pages_bp)
-app.register_blueprint(extract_pages_bp)
-app.register_blueprint(organize_pdf_bp)
-app.register_blueprint(rotate_pdf_bp)
-app.register_blueprint(add_page_numbers_bp)
-app.register_blueprint(edit_pdf_bp)
-app.register_blueprint(add_watermark_bp)
-app.register_blueprint(crop_pdf_bp)
-app.register_blueprint(compress_image_bp)
-app.register_blueprint(image_to_pdf_bp)
-app.register_blueprint(excel_to_pdf_bp)
-app.register_blueprint(word_to_pdf_bp)
-app.register_blueprint(ppt_to_pdf_bp)
-# app.register_blueprint(html_to_pdf_bp)
-app.register_blueprint(pdfa_ocr_bp)
+app.wsgi_app = ProxyFix(dispatcher, x_proto=1, x_host=1)
+
+if LAZY_IMPORTS == "eager":
+    dispatcher.load_all()
 
 @app.route("/", methods=["GET"])
 def health():
@@ -72,7 +137,38 @@ def health():
         ]
     }
 
+@app.route("/scratch-stats", methods=["GET"])
+def scratch_stats():
+    return scratch_usage()
+
+@app.route("/import-stats", methods=["GET"])
+def import_stats():
+    return dispatcher.import_stats()
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    scratch_usage()  # refresh the scratch disk gauges
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route("/admin/profiles", methods=["GET"])
+def profiles():
+    if not admin_authorized():
+        return jsonify({"error": "Admin token required"}), 403
+    return jsonify(list_profiles())
+
+@app.route("/admin/profiles/<profile_id>", methods=["GET"])
+def profile(profile_id):
+    if not admin_authorized():
+        return jsonify({"error": "Admin token required"}), 403
+    folded = load_profile(profile_id)
+    if folded is None:
+        return jsonify({"error": "Profile not found"}), 404
+    # Folded stacks: pipe into flamegraph.pl or open in speedscope
+    return Response(folded, mimetype="text/plain")
+
 if __name__ == "__main__":
-    import os
+    if LAZY_IMPORTS == "background":
+        dispatcher.start_warmup()
     port = int(os.environ.get("PORT", 8080))
-    app.run(host="0.0.0.0", port=port, debug=True)
+    app.run(host="0.0.0.0", port=port, debug=os.environ.get("FLASK_DEBUG", "0") == "1")
@@ -0,0 +1,39 @@
+import json
+import sys
+
+# Compare two benchmark result files:
+#   python -m benchmarks.compare bench-before.json bench-after.json
+# Negative latency / RSS deltas and positive throughput deltas are improvements.
+
+COLUMNS = (("p50_ms", "p50"), ("p95_ms", "p95"), ("throughput_per_s", "thrpt"), ("peak_rss_mb", "rss"))
+
+
+def change(old, new):
+    if old in (None, 0) or new is None:
+        return "     n/a"
+    return f"{(new - old) / old * 100:+7.1f}%"
+
+
+def main(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('git_revision')} {before['meta']['timestamp']}")
+    print(f"after:  {after['meta'].get('git_revision')} {after['meta']['timestamp']}")
+    print(f"{'case':40s}" + "".join(f"{label:>10s}" for _, label in COLUMNS))
+
+    for name, new in after["results"].items():
+        old = before["results"].get(name)
+        if old is None or "p50_ms" not in old or "p50_ms" not in new:
+            status = new.get("skipped") or new.get("error") or "new case"
+            print(f"{name:40s}  {status}")
+            continue
+        print(f"{name:40s}" + "".join(f"{change(old.get(key), new.get(key)):>10s}" for key, _ in COLUMNS))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m benchmarks.compare BEFORE.json AFTER.json")
+    main(sys.argv[1], sys.argv[2])
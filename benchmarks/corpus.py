@@ -0,0 +1,243 @@
+import io
+import os
+import re
+import sys
+import zipfile
+from datetime import datetime
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+# Deterministic synthetic inputs for the benchmark harness. Everything is
+# generated offline from a seed: the same seed always gives byte-identical
+# files, so runs on different commits process the same corpus.
+
+WORDS = (
+    "invoice contract agreement payment total amount date signature party "
+    "terms conditions delivery schedule account balance reference number "
+    "customer supplier address period clause section page document scanner"
+).split()
+
+FIXED_DATE = datetime(2024, 1, 1)
+FIXED_ZIP_TIME = (2024, 1, 1, 0, 0, 0)
+
+
+def sentences(rng, count, words=(6, 14)):
+    """Deterministic pseudo-text lines"""
+    return [
+        " ".join(rng.choice(WORDS, size=rng.integers(*words))).capitalize() + "."
+        for _ in range(count)
+    ]
+
+
+def text_pdf(pages=10, seed=0):
+    """Multi-page text PDF built with reportlab"""
+    rng = np.random.default_rng(seed)
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4, invariant=1)
+    width, height = A4
+    for page in range(pages):
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(72, height - 72, f"Synthetic document - page {page + 1}")
+        c.setFont("Helvetica", 11)
+        y = height - 110
+        for line in sentences(rng, 40):
+            c.drawString(72, y, line[:95])
+            y -= 16
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def page_image(rng, width=1240, height=1754, lines=40):
+    """White page with black text lines (grayscale, ~150 dpi A4)"""
+    img = np.full((height, width), 255, np.uint8)
+    y = 120
+    cv2.putText(img, "SYNTHETIC SCAN", (100, y), cv2.FONT_HERSHEY_SIMPLEX, 1.6, 0, 3, cv2.LINE_AA)
+    for line in sentences(rng, lines):
+        y += int(height * 0.85 / lines)
+        cv2.putText(img, line[:60], (100, y), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 0, 2, cv2.LINE_AA)
+    return img
+
+
+def degrade(img, rng, angle=0.0, noise=8.0, blur=True):
+    """Scanner/photo artefacts: rotation, blur, gaussian noise"""
+    h, w = img.shape[:2]
+    if angle:
+        m = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        img = cv2.warpAffine(img, m, (w, h), borderValue=255)
+    if blur:
+        img = cv2.GaussianBlur(img, (3, 3), 0)
+    if noise:
+        img = np.clip(img + rng.normal(0, noise, img.shape), 0, 255).astype(np.uint8)
+    return img
+
+
+def skewed_scan(seed=0, angle=3.0):
+    """Grayscale page scan rotated by a few degrees, as PNG bytes"""
+    rng = np.random.default_rng(seed)
+    img = degrade(page_image(rng), rng, angle=angle)
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+def scanned_pdf(pages=3, seed=0, dpi=150):
+    """Image-only PDF that looks scanned: one noisy, slightly skewed JPEG per page"""
+    rng = np.random.default_rng(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        img = degrade(page_image(rng), rng, angle=float(rng.uniform(-2, 2)))
+        jpeg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+        h, w = img.shape
+        page = doc.new_page(width=w * 72 / dpi, height=h * 72 / dpi)
+        page.insert_image(page.rect, stream=jpeg)
+    data = doc.tobytes(garbage=1, deflate=True, no_new_id=True)
+    doc.close()
+    return data
+
+
+def phone_photo(seed=0, size=(1600, 1200)):
+    """Document photographed at an angle on a desk, as JPEG bytes"""
+    rng = np.random.default_rng(seed)
+    out_w, out_h = size
+    page = cv2.cvtColor(page_image(rng, width=850, height=1100, lines=30), cv2.COLOR_GRAY2BGR)
+
+    # Desk texture
+    desk = rng.integers(60, 110, (out_h, out_w, 3), dtype=np.uint8)
+    desk = cv2.GaussianBlur(desk, (21, 21), 0)
+
+    # Random perspective: page corners jittered inside the frame
+    ph, pw = page.shape[:2]
+    src = np.float32([[0, 0], [pw, 0], [pw, ph], [0, ph]])
+    margin_x, margin_y = out_w * 0.2, out_h * 0.1
+    dst = np.float32([
+        [margin_x, margin_y],
+        [out_w - margin_x, margin_y],
+        [out_w - margin_x * 0.8, out_h - margin_y],
+        [margin_x * 0.8, out_h - margin_y],
+    ]) + rng.uniform(-30, 30, (4, 2)).astype(np.float32)
+    m = cv2.getPerspectiveTransform(src, dst)
+    warped = cv2.warpPerspective(page, m, (out_w, out_h))
+    mask = cv2.warpPerspective(np.full((ph, pw), 255, np.uint8), m, (out_w, out_h))
+    photo = np.where(mask[..., None] > 0, warped, desk)
+
+    # Uneven lighting and sensor noise
+    yy, xx = np.mgrid[0:out_h, 0:out_w]
+    shade = 1.0 - 0.35 * ((xx / out_w - 0.3) ** 2 + (yy / out_h - 0.2) ** 2)
+    photo = degrade((photo * shade[..., None]).astype(np.uint8), rng, noise=6.0, blur=False)
+    return cv2.imencode(".jpg", photo, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def _zip(files):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, content in files:
+            info = zipfile.ZipInfo(name, date_time=FIXED_ZIP_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            z.writestr(info, content)
+    return buf.getvalue()
+
+
+def docx(paragraphs=30, seed=0):
+    """Minimal WordprocessingML document"""
+    rng = np.random.default_rng(seed)
+    body = "".join(
+        f"<w:p><w:r><w:t>{line}</w:t></w:r></w:p>" for line in sentences(rng, paragraphs)
+    )
+    return _zip([
+        ("[Content_Types].xml",
+         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+         '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+         '<Default Extension="xml" ContentType="application/xml"/>'
+         '<Override PartName="/word/document.xml" '
+         'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+         '</Types>'),
+        ("_rels/.rels",
+         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+         '<Relationship Id="rId1" '
+         'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+         'Target="word/document.xml"/></Relationships>'),
+        ("word/document.xml",
+         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+         f'<w:body>{body}</w:body></w:document>'),
+    ])
+
+
+def xlsx(rows=200, seed=0):
+    """Spreadsheet with numeric and text columns (openpyxl)"""
+    from openpyxl import Workbook
+
+    rng = np.random.default_rng(seed)
+    wb = Workbook()
+    wb.properties.created = FIXED_DATE
+    wb.properties.modified = FIXED_DATE
+    ws = wb.active
+    ws.append(["Reference", "Customer", "Amount", "Quantity"])
+    for i in range(rows):
+        ws.append([f"REF-{i:05d}", str(rng.choice(WORDS)).title(),
+                   round(float(rng.uniform(10, 5000)), 2), int(rng.integers(1, 50))])
+    buf = io.BytesIO()
+    wb.save(buf)
+    # openpyxl stamps the save time into docProps; rewrite it and the zip dates
+    with zipfile.ZipFile(buf) as z:
+        files = [(n, z.read(n)) for n in z.namelist()]
+    stamp = FIXED_DATE.strftime("%Y-%m-%dT%H:%M:%SZ").encode()
+    files = [
+        (n, re.sub(rb"(<dcterms:modified[^>]*>)[^<]*", rb"\g<1>" + stamp, c) if n == "docProps/core.xml" else c)
+        for n, c in files
+    ]
+    return _zip(files)
+
+
+def fodp(slides=5, seed=0):
+    """Flat OpenDocument presentation (single XML file LibreOffice opens directly)"""
+    rng = np.random.default_rng(seed)
+    pages = "".join(
+        f'<draw:page draw:name="Slide {i + 1}"><draw:frame svg:x="2cm" svg:y="2cm" '
+        f'svg:width="24cm" svg:height="14cm"><draw:text-box>'
+        + "".join(f"<text:p>{line}</text:p>" for line in sentences(rng, 6))
+        + "</draw:text-box></draw:frame></draw:page>"
+        for i in range(slides)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<office:document xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+        'xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0" '
+        'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" '
+        'xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0" '
+        'office:version="1.2" office:mimetype="application/vnd.oasis.opendocument.presentation">'
+        f'<office:body><office:presentation>{pages}</office:presentation></office:body>'
+        '</office:document>'
+    ).encode()
+
+
+def build(seed=0):
+    """The full corpus: name -> bytes"""
+    return {
+        "text_10p.pdf": text_pdf(10, seed),
+        "text_50p.pdf": text_pdf(50, seed + 1),
+        "scanned_3p.pdf": scanned_pdf(3, seed),
+        "skewed_scan.png": skewed_scan(seed),
+        "photo_0.jpg": phone_photo(seed),
+        "photo_1.jpg": phone_photo(seed + 1),
+        "photo_2.jpg": phone_photo(seed + 2),
+        "photo_3.jpg": phone_photo(seed + 3),
+        "document.docx": docx(seed=seed),
+        "sheet.xlsx": xlsx(seed=seed),
+        "slides.fodp": fodp(seed=seed),
+    }
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.corpus OUTDIR  -- write the corpus for inspection
+    outdir = sys.argv[1] if len(sys.argv) > 1 else "bench-corpus"
+    os.makedirs(outdir, exist_ok=True)
+    for name, data in build().items():
+        with open(os.path.join(outdir, name), "wb") as f:
+            f.write(data)
+        print(f"{name}: {len(data)} bytes")
@@ -0,0 +1,370 @@
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Benchmark harness: drives every route through the Flask test client (and a
+# few engine functions directly) against the synthetic corpus, and writes
+# throughput, p50/p95 latency and peak RSS per case as JSON.
+#
+#   python -m benchmarks.run                      # all cases, 5 iterations
+#   python -m benchmarks.run -k ocr -k scan -n 20 # cases matching ocr or scan
+#   python -m benchmarks.compare old.json new.json
+#
+# Each case runs in its own interpreter so its peak RSS is not inflated by
+# earlier cases; route modules load lazily, so only the case's module is
+# imported. Cases whose external tools are missing are reported as skipped.
+
+os.environ.setdefault("LAZY_IMPORTS", "lazy")
+
+
+def _which(tool):
+    return shutil.which(tool) is not None
+
+
+def _ghostscript():
+    from services.ghostscript import gs_pool
+    return gs_pool.available
+
+
+TOOLS = {
+    "tesseract": lambda: _which("tesseract"),
+    "ghostscript": _ghostscript,
+    "soffice": lambda: _which("soffice"),
+    "ocrmypdf": lambda: _which("ocrmypdf"),
+}
+
+
+class Case:
+    def __init__(self, name, path=None, form=None, files=None, call=None, requires=()):
+        self.name = name
+        self.path = path
+        self.form = form or {}
+        self.files = files or {}  # field -> [corpus names]
+        self.call = call          # engine case: fn(corpus) -> callable
+        self.requires = requires
+
+    def missing_tools(self):
+        return [tool for tool in self.requires if not TOOLS[tool]()]
+
+    def request_data(self, corpus):
+        """Fresh multipart form for one request (streams are consumed)"""
+        data = dict(self.form)
+        for field, names in self.files.items():
+            data[field] = [(io.BytesIO(corpus[n]), n) for n in names]
+        return data
+
+    def input_bytes(self, corpus):
+        return sum(len(corpus[n]) for names in self.files.values() for n in names)
+
+
+class CorpusDir:
+    """Corpus files read on first use, so a case only holds its own inputs"""
+
+    def __init__(self, path):
+        self.path = path
+        self._cache = {}
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            with open(os.path.join(self.path, name), "rb") as f:
+                self._cache[name] = f.read()
+        return self._cache[name]
+
+
+def write_corpus(path, seed):
+    from benchmarks import corpus
+
+    os.makedirs(path, exist_ok=True)
+    for name, data in corpus.build(seed).items():
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(data)
+
+
+def _preprocess_for_ocr(profile):
+    def setup(corpus):
+        import cv2
+        import numpy as np
+        from routes.ocr import preprocess_for_ocr
+
+        img = cv2.imdecode(np.frombuffer(corpus["skewed_scan.png"], np.uint8), cv2.IMREAD_COLOR)
+        return lambda: preprocess_for_ocr(img, profile=profile)
+    return setup
+
+
+def _create_watermark_page(corpus):
+    from pypdf import PdfReader
+    from routes.add_watermark import create_watermark_page
+
+    page = PdfReader(io.BytesIO(corpus["text_10p.pdf"])).pages[0]
+    return lambda: create_watermark_page(
+        page, "text", "CONFIDENTIAL", 48, 0.3, 45, "Helvetica", "#ff0000",
+        True, False, False, "center", 15, None
+    )
+
+
+def _enhance_image(profile):
+    def setup(corpus):
+        import cv2
+        import numpy as np
+        from services.enhancement import enhance_image
+
+        img = cv2.imdecode(np.frombuffer(corpus["photo_0.jpg"], np.uint8), cv2.IMREAD_COLOR)
+        return lambda: enhance_image(img, profile=profile)
+    return setup
+
+
+def _render_thumbnail(fmt):
+    def setup(corpus):
+        import fitz  # PyMuPDF
+        from services.thumbnails import render_page
+
+        doc = fitz.open(stream=corpus["scanned_3p.pdf"], filetype="pdf")
+        return lambda: render_page(doc[0], 200, fmt)
+    return setup
+
+
+PHOTOS = ["photo_0.jpg", "photo_1.jpg", "photo_2.jpg", "photo_3.jpg"]
+CROP = json.dumps({"mode": "all", "boxes": [{"x": 36, "y": 36, "width": 400, "height": 600}]})
+
+CASES = [
+    # Scanning and OCR
+    Case("scan[quality]", "/scan", {"profile": "quality"}, {"image": ["photo_0.jpg"]}),
+    Case("scan[balanced]", "/scan", {"profile": "balanced"}, {"image": ["photo_0.jpg"]}),
+    Case("scan[fast]", "/scan", {"profile": "fast"}, {"image": ["photo_0.jpg"]}),
+    Case("scan-batch", "/scan-batch", {"profile": "balanced"}, {"images": PHOTOS}),
+    Case("detect-corners", "/detect-corners", {}, {"image": ["photo_0.jpg"]}),
+    Case("ocr", "/ocr", {"lang": "eng"}, {"image": ["skewed_scan.png"]}, requires=("tesseract",)),
+    Case("ocr-pdf", "/ocr-pdf", {"languages": "eng"}, {"file": ["scanned_3p.pdf"]},
+         requires=("tesseract", "ghostscript")),
+    Case("pdfa-ocr", "/pdfa-ocr", {"lang": "eng"}, {"files": ["scanned_3p.pdf"]},
+         requires=("ocrmypdf", "tesseract", "ghostscript")),
+    Case("extract-text-ocr", "/extract-text-ocr", {}, {"file": ["text_10p.pdf"]}),
+    # Compression
+    Case("compress-pdf[optimizer]", "/compress-pdf", {"engine": "optimizer", "profile": "ebook"},
+         {"file": ["scanned_3p.pdf"]}),
+    Case("compress-pdf[images]", "/compress-pdf", {"engine": "images", "profile": "ebook"},
+         {"file": ["scanned_3p.pdf"]}),
+    Case("compress-pdf[ghostscript]", "/compress-pdf", {"engine": "ghostscript", "profile": "ebook"},
+         {"file": ["scanned_3p.pdf"]}, requires=("ghostscript",)),
+    Case("compress-pdf/analyze", "/compress-pdf/analyze", {}, {"file": ["scanned_3p.pdf"]}),
+    Case("compress-image", "/compress-image", {}, {"file": ["photo_0.jpg"]}),
+    Case("compress-image[batch]", "/compress-image", {}, {"files": PHOTOS}),
+    Case("image-to-pdf", "/image-to-pdf", {"pageSize": "a4"}, {"images": PHOTOS}),
+    # Page operations
+    Case("merge-pdf", "/merge-pdf", {}, {"files": ["text_10p.pdf", "text_50p.pdf"]}),
+    Case("split-pdf", "/split-pdf", {}, {"file": ["text_50p.pdf"]}),
+    Case("delete-pages", "/delete-pages", {"pages": "2-5,10"}, {"file": ["text_50p.pdf"]}),
+    Case("extract-pages", "/extract-pages", {"pages": "1-10"}, {"file": ["text_50p.pdf"]}),
+    Case("organize-pdf", "/organize-pdf",
+         {"layout": json.dumps([{"type": "page", "pageIndex": i} for i in reversed(range(10))])},
+         {"files": ["text_10p.pdf"]}),
+    Case("rotate-pdf", "/rotate-pdf", {"rotations": json.dumps([90] * 50)}, {"files": ["text_50p.pdf"]}),
+    Case("add-page-numbers", "/add-page-numbers", {}, {"files": ["text_50p.pdf"]}),
+    Case("add-watermark", "/add-watermark", {"type": "text", "text": "CONFIDENTIAL", "rotation": "45"},
+         {"files": ["text_50p.pdf"]}),
+    Case("crop-pdf", "/crop-pdf", {"cropData": CROP}, {"file": ["text_10p.pdf"]}),
+    Case("edit-pdf", "/edit-pdf", {}, {"file": ["text_10p.pdf"]}),
+    Case("inspect-pdf", "/inspect-pdf", {}, {"file": ["text_50p.pdf"]}),
+    # Rendered once, then served from the thumbnail cache: measures repeat views
+    Case("thumbnails", "/thumbnails", {"width": "200"}, {"file": ["text_50p.pdf"]}),
+    # Office conversion
+    Case("word-to-pdf", "/word-to-pdf", {}, {"files": ["document.docx"]}, requires=("soffice",)),
+    Case("excel-to-pdf", "/excel-to-pdf", {}, {"files": ["sheet.xlsx"]}, requires=("soffice",)),
+    Case("ppt-to-pdf", "/ppt-to-pdf", {}, {"files": ["slides.fodp"]}, requires=("soffice",)),
+    # Engine functions called directly
+    Case("engine:preprocess_for_ocr[quality]", call=_preprocess_for_ocr("quality")),
+    Case("engine:preprocess_for_ocr[balanced]", call=_preprocess_for_ocr("balanced")),
+    Case("engine:preprocess_for_ocr[fast]", call=_preprocess_for_ocr("fast")),
+    Case("engine:create_watermark_page", call=_create_watermark_page),
+    Case("engine:render_thumbnail[webp]", call=_render_thumbnail("webp")),
+    Case("engine:render_thumbnail[jpeg]", call=_render_thumbnail("jpeg")),
+    Case("engine:enhance_image[quality]", call=_enhance_image("quality")),
+    Case("engine:enhance_image[balanced]", call=_enhance_image("balanced")),
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_mb():
+    """Peak RSS of this process in MB"""
+    # VmHWM belongs to this address space; ru_maxrss on Linux carries over
+    # the parent's peak across fork/exec and would hide the case's own usage
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_case(case, corpus, iterations, warmup):
+    """Run one case in this process; returns its result dict"""
+    missing = case.missing_tools()
+    if missing:
+        return {"skipped": f"requires {', '.join(missing)}"}
+
+    if case.call:
+        fn = case.call(corpus)
+
+        def run_once():
+            fn()
+            return None
+        input_bytes = None
+    else:
+        from app import app
+        client = app.test_client()
+
+        def run_once():
+            response = client.post(case.path, data=case.request_data(corpus),
+                                   content_type="multipart/form-data")
+            body = response.data
+            response.close()
+            if response.status_code != 200:
+                return f"HTTP {response.status_code}: {body[:200].decode(errors='replace')}"
+            return None
+        input_bytes = case.input_bytes(corpus)
+
+    for _ in range(warmup):
+        error = run_once()
+        if error:
+            return {"error": error}
+
+    baseline_rss = peak_rss_mb()
+    latencies = []
+    errors = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        if run_once():
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+
+    total = sum(latencies)
+    result = {
+        "iterations": iterations,
+        "errors": errors,
+        "throughput_per_s": round(iterations / total, 3),
+        "mean_ms": round(total / iterations * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "baseline_rss_mb": baseline_rss,
+    }
+    if input_bytes:
+        result["input_bytes"] = input_bytes
+        result["input_mb_per_s"] = round(input_bytes * iterations / total / (1024 * 1024), 3)
+    return result
+
+
+def run_isolated(case, args, corpus_dir):
+    """Run one case in a fresh interpreter and read back its result"""
+    with tempfile.NamedTemporaryFile(suffix=".json") as out:
+        cmd = [sys.executable, "-m", "benchmarks.run", "--case", case.name,
+               "-n", str(args.iterations), "--warmup", str(args.warmup),
+               "--corpus-dir", corpus_dir, "--result-file", out.name]
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if proc.returncode != 0:
+            lines = proc.stderr.decode(errors="replace").strip().splitlines()
+            return {"error": lines[-1] if lines else f"exit code {proc.returncode}"}
+        with open(out.name) as f:
+            return json.load(f)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every route against a synthetic corpus")
+    parser.add_argument("-n", "--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-k", "--filter", action="append", default=[],
+                        help="only cases whose name contains this (repeatable)")
+    parser.add_argument("-o", "--output", help="results file (default bench-<timestamp>.json)")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="run all cases in this process (peak RSS becomes cumulative)")
+    parser.add_argument("--list", action="store_true", help="list cases and exit")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.list:
+        for case in CASES:
+            print(case.name)
+        return
+
+    # Child mode: one case, result written to --result-file
+    if args.case:
+        case = next(c for c in CASES if c.name == args.case)
+        result = run_case(case, CorpusDir(args.corpus_dir), args.iterations, args.warmup)
+        with open(args.result_file, "w") as f:
+            json.dump(result, f)
+        return
+
+    cases = [c for c in CASES if not args.filter or any(k in c.name for k in args.filter)]
+    corpus_dir = tempfile.mkdtemp(prefix="bench-corpus-")
+    write_corpus(corpus_dir, args.seed)
+    corpus = CorpusDir(corpus_dir)
+
+    results = {}
+    for case in cases:
+        if args.no_isolate:
+            results[case.name] = run_case(case, corpus, args.iterations, args.warmup)
+        else:
+            results[case.name] = run_isolated(case, args, corpus_dir)
+        r = results[case.name]
+        if "p50_ms" in r:
+            print(f"{case.name:40s} p50 {r['p50_ms']:9.1f} ms  p95 {r['p95_ms']:9.1f} ms  "
+                  f"{r['throughput_per_s']:7.2f}/s  peak {r['peak_rss_mb']:7.1f} MB", file=sys.stderr)
+        else:
+            print(f"{case.name:40s} {r.get('skipped') or r.get('error')}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "isolated": not args.no_isolate,
+        },
+        "results": results,
+    }
+    shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    output = args.output or f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Gunicorn configuration, loaded automatically from the working directory.
+# Pool sizing lives in serving.py; pick the pool with SERVING_POOL.
+import gc
+import os
+import shutil
+import tempfile
+
+from serving import SERVING_POOL, pool_settings
+
+# Workers write Prometheus samples here and /metrics aggregates them. Must be
+# set before the app (and prometheus_client) is imported; cleared on startup
+# so counters from a previous run don't leak in.
+_metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "scanner-metrics")
+)
+shutil.rmtree(_metrics_dir, ignore_errors=True)
+os.makedirs(_metrics_dir, exist_ok=True)
+
+_settings = pool_settings()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+worker_class = "gthread"
+workers = _settings["workers"]
+threads = _settings["threads"]
+timeout = _settings["timeout"]
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers gradually to bound leaks from native libraries
+max_requests = _settings["max_requests"]
+max_requests_jitter = max(1, _settings["max_requests"] // 10)
+
+# Load the app once in the master; workers share its pages copy-on-write.
+# With LAZY_IMPORTS=eager the route modules (cv2, numpy, fitz, ...) are
+# imported here too; the default "background" imports them per worker.
+preload_app = True
+
+proc_name = f"scanner-backend-{SERVING_POOL}"
+accesslog = "-"
+
+
+def when_ready(server):
+    # Move everything imported so far out of the GC's reach so collections in
+    # the workers don't touch (and copy) the shared pages
+    gc.freeze()
+    server.log.info(
+        f"Serving pool '{SERVING_POOL}': {workers} workers x {threads} threads, timeout {timeout}s"
+    )
+
+
+def post_fork(server, worker):
+    # Background threads do not survive fork; restart them per worker
+    from services.scratch import restart_after_fork
+    restart_after_fork()
+
+    # Import route modules after the fork, never while forking (import locks)
+    from app import LAZY_IMPORTS, dispatcher
+    if LAZY_IMPORTS == "background":
+        dispatcher.start_warmup()
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges (in-progress requests)
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
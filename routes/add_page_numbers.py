@@ -1,7 +1,9 @@
 from flask import Blueprint, request, send_file, jsonify
 import fitz  # PyMuPDF
-import tempfile
 import json
+from services.memory import MemoryBudgetError, check_budget, estimate_pdf
+from services.scratch import scratch_path
+from services.uploads import UploadLimitError, open_pdf, upload_limits, upload_size
 
 add_page_numbers_bp = Blueprint(
     "add_page_numbers",
@@ -9,7 +11,11 @@ add_page_numbers_bp = Blueprint(
     url_prefix="/add-page-numbers"
 )
 
+PAGE_NUMBERS_MAX_UPLOAD_MB = 200
+PAGE_NUMBERS_MAX_PAGES = 2000
+
 @add_page_numbers_bp.route("/", methods=["POST"])
+@upload_limits(max_mb=PAGE_NUMBERS_MAX_UPLOAD_MB)
 def add_page_numbers():
     """
     Add customizable page numbers to uploaded PDF files
@@ -46,18 +52,30 @@ def add_page_numbers():
         if start_page < 0:
             return jsonify({"error": "Start page must be at least 1"}), 400
 
-        # Create output PDF
-        output_pdf = fitz.open()
+        # Open every input first so the merged working set can be checked
+        # against the memory budget before anything is copied
+        sources = []
+        try:
+            page_count, total_bytes = 0, 0
+            for file in files:
+                try:
+                    pdf = open_pdf(file, max_pages=PAGE_NUMBERS_MAX_PAGES - page_count)
+                except UploadLimitError:
+                    return jsonify({"error": f"Too many pages; the limit is {PAGE_NUMBERS_MAX_PAGES}"}), 413
+                except Exception as e:
+                    return jsonify({"error": f"Error processing {file.filename}: {str(e)}"}), 400
+                sources.append(pdf)
+                page_count += len(pdf)
+                total_bytes += upload_size(file)
+            check_budget(estimate_pdf(total_bytes, page_count), "These PDFs")
 
-        # Merge all uploaded PDFs
-        for file in files:
-            try:
-                pdf_data = file.read()
-                pdf = fitz.open(stream=pdf_data, filetype="pdf")
+            # Merge all uploaded PDFs
+            output_pdf = fitz.open()
+            for pdf in sources:
                 output_pdf.insert_pdf(pdf)
+        finally:
+            for pdf in sources:
                 pdf.close()
-            except Exception as e:
-                return jsonify({"error": f"Error processing {file.filename}: {str(e)}"}), 400
 
         total_pages = len(output_pdf)
         
@@ -124,34 +142,20 @@ def add_page_numbers():
             except Exception as e:
                 print(f"Error inserting text on page {page_index + 1}: {e}")
 
-        # Save to temporary file
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        tmp_path = tmp.name
-        tmp.close()  # Close the file handle before saving
-        
-        output_pdf.save(tmp_path)
+        # Save to request scratch space (removed after the response closes)
+        output_path = scratch_path("page-numbered.pdf")
+        output_pdf.save(output_path)
         output_pdf.close()
 
-        # Send the file and schedule cleanup
-        response = send_file(
-            tmp_path,
+        return send_file(
+            output_path,
             as_attachment=True,
             download_name="page-numbered.pdf",
             mimetype="application/pdf"
         )
-        
-        # Clean up temp file after sending
-        @response.call_on_close
-        def cleanup():
-            try:
-                import os
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-            except:
-                pass
-        
-        return response
 
+    except MemoryBudgetError as e:
+        return jsonify({"error": str(e)}), 413
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
@@ -1,92 +1,188 @@
 import os
 import subprocess
-import platform
-import tempfile
-from flask import Blueprint, request, send_file, jsonify, after_this_request
+from flask import Blueprint, request, send_file, jsonify
+from services.admission import admit
+from services.ghostscript import (
+    DEFAULT_PROFILE,
+    PROFILES,
+    compress_to_target,
+    compress_with_profile,
+    gs_pool,
+)
+from services.deadline import DeadlineExceeded
+from services.image_recompress import recompress_images
+from services.metrics import StageTimer
+from services.pdf_analysis import analyze_pdf
+from services.pdf_optimizer import optimize_pdf
+from services.scratch import scratch_path
 
 compress_bp = Blueprint("compress", __name__, url_prefix="/compress-pdf")
 
-# =======================
-# Detect Ghostscript path
-# =======================
-if platform.system() == "Windows":
-    # Windows: point directly to gswin64c.exe
-    GS_PATH = r"C:\Program Files\gs\gs10.06.0\bin\gswin64c.exe"
-else:
-    # Linux/Mac: use gs in PATH
-    import shutil
-    GS_PATH = shutil.which("gs")
-    if not GS_PATH:
-        raise RuntimeError("Ghostscript not found. Please install Ghostscript.")
+# The structural optimizer wins when it reaches this fraction of the input size
+OPTIMIZER_TARGET_RATIO = float(os.environ.get("OPTIMIZER_TARGET_RATIO", 0.8))
+ENGINES = ("auto", "optimizer", "ghostscript", "images")
 
 # =======================
 # Compress PDF Endpoint
 # =======================
 @compress_bp.route("/", methods=["POST"])
+@admit("ghostscript")
 def compress_pdf():
     if "file" not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
 
     file = request.files["file"]
-    input_path = None
-    output_path = None
+    optimized_path = None
+
+    # Named profile (screen, ebook, printer, lossless) or a target size in bytes
+    profile = request.form.get("profile", DEFAULT_PROFILE).lower()
+    if profile not in PROFILES:
+        return jsonify({
+            "error": f"Unknown profile '{profile}'",
+            "profiles": list(PROFILES)
+        }), 400
+
+    engine = request.form.get("engine", "auto").lower()
+    if engine not in ENGINES:
+        return jsonify({"error": f"Unknown engine '{engine}'", "engines": list(ENGINES)}), 400
+
+    # The images engine always re-encodes images, which lossless forbids
+    if engine == "images" and PROFILES[profile]["jpegq"] is None:
+        return jsonify({"error": f"Profile '{profile}' is not supported by the images engine"}), 400
+
+    # Ghostscript is located on first use; only the gs paths need it
+    if engine in ("auto", "ghostscript") and not gs_pool.available:
+        return jsonify({"error": "Ghostscript not found. Please install Ghostscript."}), 503
+
+    target_size = request.form.get("targetSize")
+    if target_size:
+        try:
+            target_size = int(target_size)
+            if target_size <= 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({"error": "targetSize must be a positive number of bytes"}), 400
 
     try:
-        # Save uploaded PDF to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_input:
-            file.save(tmp_input.name)
-            input_path = tmp_input.name
-
-        # Temp output file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_output:
-            output_path = tmp_output.name
-
-        subprocess.run(
-            [
-                GS_PATH,
-                "-sDEVICE=pdfwrite",
-                "-dCompatibilityLevel=1.4",
-                "-dDownsampleColorImages=true",
-                "-dDownsampleGrayImages=true",
-                "-dDownsampleMonoImages=true",
-                "-dColorImageResolution=100",
-                "-dGrayImageResolution=100",
-                "-dMonoImageResolution=300",
-                "-dColorImageDownsampleType=/Bicubic",
-                "-dGrayImageDownsampleType=/Bicubic",
-                "-dMonoImageDownsampleType=/Subsample",
-                "-dJPEGQ=60",
-                "-dDetectDuplicateImages=true",
-                "-dCompressFonts=true",
-                "-dSubsetFonts=true",
-                "-dNOPAUSE",
-                "-dQUIET",
-                "-dBATCH",
-                f"-sOutputFile={output_path}",
-                input_path,
-            ],
-            check=True,
-        )
+        # Input/output live in the request scratch directory
+        input_path = scratch_path("input.pdf")
+        output_path = scratch_path("compressed.pdf")
+        file.save(input_path)
+
+        original_size = os.path.getsize(input_path)
+        met_target = None
+        used_engine = None
+        optimized_size = None
+        timer = StageTimer()
+
+        # =======================
+        # Per-image parallel recompression (scanned / image-heavy PDFs)
+        # =======================
+        if engine == "images":
+            settings = PROFILES[profile]
+            try:
+                with timer.stage("recompress"):
+                    stats = recompress_images(
+                        input_path, output_path,
+                        max_dpi=settings["dpi"],
+                        jpeg_quality=settings["jpegq"]
+                    )
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"Image recompression failed: {e}")
+            print(f"Image recompression: {original_size} -> {stats['size']} bytes {stats}")
+            compressed_size = stats["size"]
+            used_engine = "images"
+            if target_size:
+                met_target = compressed_size <= target_size
 
         # =======================
-        # Cleanup temp files safely (Windows-friendly)
+        # Fast path: structural optimizer (pikepdf + PyMuPDF)
         # =======================
-        @after_this_request
-        def cleanup(response):
+        if engine in ("auto", "optimizer"):
+            optimized_path = output_path + ".opt.pdf"
+            settings = PROFILES[profile]
+            goal = target_size or int(original_size * OPTIMIZER_TARGET_RATIO)
             try:
-                for path in [input_path, output_path]:
-                    if path and os.path.exists(path):
-                        os.remove(path)
+                with timer.stage("optimize"):
+                    stats = optimize_pdf(
+                        input_path, optimized_path,
+                        max_dpi=settings["dpi"],
+                        jpeg_quality=settings["jpegq"] or 75
+                    )
+                optimized_size = stats["size"]
+                print(f"Optimizer: {original_size} -> {optimized_size} bytes {stats}")
+                if engine == "optimizer" or optimized_size <= goal:
+                    os.replace(optimized_path, output_path)
+                    compressed_size = optimized_size
+                    used_engine = "optimizer"
+                    if target_size:
+                        met_target = optimized_size <= target_size
             except Exception as e:
-                print("Cleanup error:", e)
-            return response
+                if engine == "optimizer":
+                    raise RuntimeError(f"Optimizer failed: {e}")
+                print(f"Optimizer failed, falling back to Ghostscript: {e}")
+                optimized_size = None
+
+        # =======================
+        # Ghostscript re-render
+        # =======================
+        if used_engine is None:
+            used_engine = "ghostscript"
+            if target_size:
+                compressed_size, settings, met_target = compress_to_target(input_path, output_path, target_size)
+                profile = f"target:{settings['dpi']}dpi/q{settings['jpegq']}"
+            else:
+                compressed_size = compress_with_profile(input_path, output_path, profile)
+
+            # Keep the optimizer result if Ghostscript could not beat it
+            if optimized_size is not None and optimized_size < compressed_size:
+                os.replace(optimized_path, output_path)
+                compressed_size = optimized_size
+                used_engine = "optimizer"
+                if target_size:
+                    met_target = optimized_size <= target_size
 
         # Send compressed file
-        return send_file(
+        response = send_file(
             output_path,
             as_attachment=True,
             download_name=f"compressed_{file.filename}",
         )
+        response.headers["X-Compression-Engine"] = used_engine
+        response.headers["X-Compression-Profile"] = profile
+        response.headers["X-Original-Size"] = str(original_size)
+        response.headers["X-Compressed-Size"] = str(compressed_size)
+        if met_target is not None:
+            response.headers["X-Target-Met"] = "true" if met_target else "false"
+        return response
 
-    except subprocess.CalledProcessError as e:
+    except (RuntimeError, subprocess.CalledProcessError) as e:
         return jsonify({"error": f"Compression failed: {str(e)}"}), 500
+
+
+# =======================
+# Dry run: analyze without rewriting
+# =======================
+@compress_bp.route("/analyze", methods=["POST"])
+def analyze():
+    if "file" not in request.files:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    file = request.files["file"]
+
+    try:
+        input_path = scratch_path("input.pdf")
+        file.save(input_path)
+
+        report = analyze_pdf(input_path)
+
+        # Frontend hint: skip compression when no profile saves at least 10%
+        best = max(report["predictions"].values(), key=lambda p: p["predicted_saving"])
+        report["worth_compressing"] = best["predicted_saving"] >= 0.1
+
+        return jsonify(report)
+
+    except Exception as e:
+        return jsonify({"error": f"Analysis failed: {str(e)}"}), 400
@@ -1,55 +1,167 @@
-from flask import Blueprint, request, send_file, jsonify, after_this_request
-from PIL import Image
-import tempfile, os
+from flask import Blueprint, request, send_file, jsonify
+from PIL import Image, ImageOps
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import os
+import zipfile
 
 compress_image_bp = Blueprint("compress_image", __name__, url_prefix="/compress-image")
 
+MAX_WIDTH = 1200
+DEFAULT_QUALITY = 30
+FORMATS = ("auto", "jpeg", "webp", "png")
+# JPEG, as before formats existed; "auto" (PNG/WebP/JPEG by content) is opt-in
+DEFAULT_FORMAT = "jpeg"
+EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp", "PNG": "png"}
+MIMETYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+BATCH_WORKERS = int(os.environ.get("COMPRESS_IMAGE_WORKERS", os.cpu_count() or 2))
+
+# Palette sizes tried (largest first) when a PNG must hit a target size
+PNG_COLOR_STEPS = (256, 128, 64, 32, 16)
+
+
+def load_image(stream, max_width):
+    """Decode straight from the upload stream; JPEGs are downscaled during decode"""
+    img = Image.open(stream)
+    if img.format == "JPEG" and img.width > max_width:
+        # DCT scaling: decode at 1/2, 1/4 or 1/8 size, never below max_width
+        img.draft("RGB", (max_width, int(img.height * max_width / img.width)))
+    img = ImageOps.exif_transpose(img)
+
+    # Resize large images to reduce file size
+    if img.width > max_width:
+        ratio = max_width / img.width
+        img = img.resize(
+            (max_width, max(1, int(img.height * ratio))),
+            Image.LANCZOS
+        )
+    return img
+
+
+def has_alpha(img):
+    if img.mode in ("RGBA", "LA"):
+        return img.getchannel("A").getextrema()[0] < 255
+    return img.mode == "P" and "transparency" in img.info
+
+
+def choose_format(img):
+    """Alpha -> WebP, flat graphics (few colours) -> quantized PNG, photos -> JPEG"""
+    if has_alpha(img):
+        return "WEBP"
+    thumb = img.convert("RGB")
+    thumb.thumbnail((256, 256))
+    if thumb.getcolors(maxcolors=256) is not None:
+        return "PNG"
+    return "JPEG"
+
+
+def encode(img, fmt, quality):
+    """Encode with one quality setting (palette size for PNG)"""
+    out = BytesIO()
+    if fmt == "PNG":
+        src = img.convert("RGBA") if has_alpha(img) else img.convert("RGB")
+        method = Image.Quantize.FASTOCTREE if src.mode == "RGBA" else Image.Quantize.MEDIANCUT
+        src.quantize(colors=quality, method=method).save(out, format="PNG", optimize=True)
+    elif fmt == "WEBP":
+        src = img if img.mode in ("RGB", "RGBA") else img.convert("RGBA" if has_alpha(img) else "RGB")
+        src.save(out, format="WEBP", quality=quality, method=4)
+    else:
+        # Convert PNG/WEBP with alpha to RGB
+        src = img if img.mode in ("RGB", "L") else img.convert("RGB")
+        src.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def encode_to_target(img, fmt, target_size):
+    """Binary search the highest quality whose output fits target_size bytes"""
+    if fmt == "PNG":
+        best = None
+        for colors in PNG_COLOR_STEPS:
+            best = encode(img, fmt, colors)
+            if len(best) <= target_size:
+                break
+        return best
+
+    lo, hi = 5, 95
+    best = None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        data = encode(img, fmt, mid)
+        if len(data) <= target_size:
+            best = data
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return best if best is not None else encode(img, fmt, 5)
+
+
+def compress_one(file, fmt, quality, target_size, max_width):
+    img = load_image(file.stream, max_width)
+    out_fmt = choose_format(img) if fmt == "auto" else fmt.upper()
+
+    # Remove metadata (EXIF) to save extra bytes
+    img.info.pop("exif", None)
+
+    if target_size:
+        data = encode_to_target(img, out_fmt, target_size)
+    else:
+        data = encode(img, out_fmt, 256 if out_fmt == "PNG" else quality)
+    return data, out_fmt
+
+
+def output_name(filename, fmt):
+    base = os.path.splitext(filename or "image")[0]
+    return f"compressed_{base}.{EXTENSIONS[fmt]}"
+
+
 @compress_image_bp.route("/", methods=["POST"])
 def compress_image():
-    if "file" not in request.files:
+    files = request.files.getlist("files") or request.files.getlist("file")
+    if not files:
         return jsonify({"error": "No file uploaded"}), 400
 
-    file = request.files["file"]
-    input_path = tempfile.NamedTemporaryFile(delete=False).name
-    output_path = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg").name
+    fmt = request.form.get("format", DEFAULT_FORMAT).lower()
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Unsupported format '{fmt}'", "formats": list(FORMATS)}), 400
 
     try:
-        file.save(input_path)
-        img = Image.open(input_path)
+        quality = int(request.form.get("quality", DEFAULT_QUALITY))
+        max_width = int(request.form.get("maxWidth", MAX_WIDTH))
+        target_size = int(request.form.get("targetSize", 0))
+    except ValueError:
+        return jsonify({"error": "quality, maxWidth and targetSize must be integers"}), 400
 
-        # Convert PNG/WEBP with alpha to RGB
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-
-        # Resize large images to reduce file size
-        MAX_WIDTH = 1200
-        if img.width > MAX_WIDTH:
-            ratio = MAX_WIDTH / img.width
-            img = img.resize(
-                (int(img.width * ratio), int(img.height * ratio)),
-                Image.LANCZOS
-            )
+    if not 1 <= quality <= 95 or max_width < 16 or target_size < 0:
+        return jsonify({"error": "Invalid quality, maxWidth or targetSize"}), 400
 
-        # Remove metadata (EXIF) to save extra bytes
-        img.info.pop("exif", None)
+    try:
+        if len(files) == 1:
+            data, out_fmt = compress_one(files[0], fmt, quality, target_size, max_width)
+            return send_file(
+                BytesIO(data),
+                mimetype=MIMETYPES[out_fmt],
+                as_attachment=True,
+                download_name=output_name(files[0].filename, out_fmt)
+            )
 
-        # Strong compression
-        img.save(
-            output_path,
-            format="JPEG",
-            quality=30,        # Sweet spot: 35–45
-            optimize=True,
-            progressive=True
-        )
+        # Batch: compress in parallel, return a zip in upload order
+        with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(files))) as pool:
+            results = list(pool.map(
+                lambda f: compress_one(f, fmt, quality, target_size, max_width), files
+            ))
 
-        @after_this_request
-        def cleanup(response):
-            for p in [input_path, output_path]:
-                if os.path.exists(p):
-                    os.remove(p)
-            return response
+        zip_buffer = BytesIO()
+        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_STORED) as z:
+            for idx, (file, (data, out_fmt)) in enumerate(zip(files, results)):
+                z.writestr(f"{idx + 1:03d}_{output_name(file.filename, out_fmt)}", data)
+        zip_buffer.seek(0)
 
-        return send_file(output_path, as_attachment=True, download_name=f"compressed_{file.filename}")
+        return send_file(
+            zip_buffer,
+            mimetype="application/zip",
+            as_attachment=True,
+            download_name="compressed_images.zip"
+        )
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
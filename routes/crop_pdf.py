@@ -4,12 +4,10 @@ import os
 import json
 from werkzeug.utils import secure_filename
 from datetime import datetime
+from services.scratch import scratch_dir
 
 crop_pdf_bp = Blueprint("crop_pdf", __name__)
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 @crop_pdf_bp.route("/crop-pdf", methods=["POST"])
 def crop_pdf():
     """Crop PDF pages - supports both single and multiple PDFs with merging"""
@@ -46,6 +44,7 @@ def crop_pdf():
         is_multiple_files = isinstance(crop_data, list)
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        workdir = scratch_dir()  # removed after the response closes
         input_paths = []
         cropped_docs = []
 
@@ -66,7 +65,7 @@ def crop_pdf():
                     # Save uploaded file
                     filename = secure_filename(file.filename)
                     unique_filename = f"{timestamp}_{file_index}_{filename}"
-                    input_path = os.path.join(UPLOAD_DIR, unique_filename)
+                    input_path = os.path.join(workdir, unique_filename)
                     file.save(input_path)
                     input_paths.append(input_path)
                     
@@ -115,7 +114,7 @@ def crop_pdf():
                 
                 # Save merged PDF
                 output_filename = f"cropped_merged_{timestamp}.pdf"
-                output_path = os.path.join(UPLOAD_DIR, output_filename)
+                output_path = os.path.join(workdir, output_filename)
                 merged_doc.save(output_path)
                 merged_doc.close()
                 
@@ -124,7 +123,7 @@ def crop_pdf():
                 file = uploaded_files[0]
                 filename = secure_filename(file.filename)
                 unique_filename = f"{timestamp}_{filename}"
-                input_path = os.path.join(UPLOAD_DIR, unique_filename)
+                input_path = os.path.join(workdir, unique_filename)
                 file.save(input_path)
                 input_paths.append(input_path)
                 
@@ -197,7 +196,7 @@ def crop_pdf():
                 
                 # Save cropped PDF
                 output_filename = f"cropped_{timestamp}_{filename}"
-                output_path = os.path.join(UPLOAD_DIR, output_filename)
+                output_path = os.path.join(workdir, output_filename)
                 doc.save(output_path)
                 doc.close()
 
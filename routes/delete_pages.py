@@ -1,6 +1,6 @@
 from flask import Blueprint, request, send_file, jsonify
 from PyPDF2 import PdfReader, PdfWriter
-import tempfile
+from services.scratch import scratch_path
 
 delete_pages_bp = Blueprint(
     "delete_pages",
@@ -43,12 +43,12 @@ def delete_pages():
     if len(writer.pages) == 0:
         return jsonify({"error": "All pages removed"}), 400
 
-    temp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    with open(temp.name, "wb") as f:
+    output_path = scratch_path("pages_deleted.pdf")
+    with open(output_path, "wb") as f:
         writer.write(f)
 
     return send_file(
-        temp.name,
+        output_path,
         as_attachment=True,
         download_name="pages_deleted.pdf",
         mimetype="application/pdf"
@@ -7,14 +7,24 @@ from PIL import Image
 import pytesseract
 import cv2
 import numpy as np
+from services.admission import admit
+from services.deadline import DeadlineExceeded, check, timeout
+from services.memory import MemoryBudgetError, check_budget, estimate_pdf
+from services.metrics import StageTimer
+from services.pdf_cache import PdfCache
+from services.uploads import UploadLimitError, open_pdf, upload_buffer, upload_limits, upload_size
 
 edit_pdf_bp = Blueprint('edit_pdf', __name__)
 
-# Store PDF in memory for image extraction (temporary solution)
-# In production, use proper session management or database
-pdf_cache = {}
+# Uploaded PDFs kept on disk for follow-up image extraction (bounded by
+# PDF_CACHE_MAX_MB / PDF_CACHE_MAX_AGE and shared between workers)
+pdf_cache = PdfCache()
+
+EDIT_MAX_UPLOAD_MB = 100
+EDIT_MAX_PAGES = 500
 
 @edit_pdf_bp.route('/edit-pdf', methods=['POST'])
+@upload_limits(max_mb=EDIT_MAX_UPLOAD_MB)
 def edit_pdf():
     """
     Advanced PDF editor: add text, images, shapes, and drawings
@@ -36,8 +46,7 @@ def edit_pdf():
             except json.JSONDecodeError:
                 return jsonify({"error": "Invalid annotations format"}), 400
 
-        pdf_content = pdf_file.read()
-        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
+        pdf_document = open_pdf(pdf_file, max_pages=EDIT_MAX_PAGES)
 
         for page_data in annotations_data:
             page_num = page_data.get('pageNum', 1) - 1
@@ -115,12 +124,17 @@ def edit_pdf():
             download_name='edited.pdf'
         )
 
+    except UploadLimitError as e:
+        return jsonify({"error": str(e)}), 413
+
     except Exception as e:
         print(f"Error in edit_pdf: {e}")
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
 
 @edit_pdf_bp.route('/extract-text-ocr', methods=['POST'])
+@upload_limits(max_mb=EDIT_MAX_UPLOAD_MB)
+@admit("tesseract")
 def extract_text_ocr():
     """
     Extract text and images from PDF using native extraction first, then OCR as fallback
@@ -135,12 +149,17 @@ def extract_text_ocr():
         if not pdf_file.filename.lower().endswith('.pdf'):
             return jsonify({"error": "Invalid file type"}), 400
 
-        pdf_content = pdf_file.read()
-        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
+        # Opened by path when spooled to disk; no full copy in memory
+        pdf_document = open_pdf(pdf_file, max_pages=EDIT_MAX_PAGES)
+        try:
+            check_budget(estimate_pdf(upload_size(pdf_file), len(pdf_document)), "This PDF")
+        except MemoryBudgetError as e:
+            pdf_document.close()
+            return jsonify({"error": str(e)}), 413
 
         # Cache PDF for image extraction
-        pdf_id = str(hash(pdf_content))[:16]
-        pdf_cache[pdf_id] = pdf_content
+        with upload_buffer(pdf_file) as buf:
+            pdf_id = pdf_cache.put(buf)
 
         all_pages_data = []
 
@@ -174,6 +193,12 @@ def extract_text_ocr():
             "pages": all_pages_data
         })
 
+    except DeadlineExceeded:
+        raise
+
+    except UploadLimitError as e:
+        return jsonify({"error": str(e)}), 413
+
     except Exception as e:
         print(f"Error in extract_text_ocr: {e}")
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
@@ -190,11 +215,11 @@ def get_pdf_image():
         page_num = data.get('pageNum', 1) - 1
         pdf_id = data.get('pdfId')
 
-        if pdf_id not in pdf_cache:
+        pdf_path = pdf_cache.path(pdf_id)
+        if pdf_path is None:
             return jsonify({"error": "PDF not found in cache"}), 404
 
-        pdf_content = pdf_cache[pdf_id]
-        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
+        pdf_document = fitz.open(pdf_path, filetype="pdf")
 
         if page_num < 0 or page_num >= pdf_document.page_count:
             return jsonify({"error": "Invalid page number"}), 400
@@ -278,18 +303,22 @@ def extract_text_blocks_ocr(page):
     text_blocks = []
     
     try:
+        timer = StageTimer()
         zoom = 2
         mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat)
-        
-        img_data = pix.tobytes("png")
+        with timer.stage("render"):
+            pix = page.get_pixmap(matrix=mat)
+            img_data = pix.tobytes("png")
         img = Image.open(BytesIO(img_data))
         
         img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
         gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
         gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
         
-        ocr_data = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
+        with timer.stage("ocr"):
+            ocr_data = pytesseract.image_to_data(
+                gray, output_type=pytesseract.Output.DICT, timeout=timeout("tesseract") or 0
+            )
         
         n_boxes = len(ocr_data['text'])
         for i in range(n_boxes):
@@ -318,6 +347,8 @@ def extract_text_blocks_ocr(page):
                 })
     
     except Exception as e:
+        # Out of request time: stop instead of skipping OCR on every remaining page
+        check("tesseract")
         print(f"Error in OCR extraction: {e}")
     
     return text_blocks
@@ -1,12 +1,16 @@
 from flask import Blueprint, request, send_file, jsonify
-import subprocess
 import os
-import uuid
 from PyPDF2 import PdfMerger
+from services.admission import admit
+from services.deadline import DeadlineExceeded, run_subprocess
+from services.metrics import track_subprocess
+from services.scratch import scratch_dir
+from services.uploads import safe_filename
 
 excel_to_pdf_bp = Blueprint("excel_to_pdf", __name__)
 
 @excel_to_pdf_bp.route("/excel-to-pdf", methods=["POST"])
+@admit("libreoffice")
 def excel_to_pdf():
     if "files" not in request.files:
         return jsonify({"error": "No files uploaded"}), 400
@@ -15,26 +19,32 @@ def excel_to_pdf():
     temp_pdf_paths = []
 
     try:
-        for file in files:
-            temp_id = str(uuid.uuid4())
-            input_path = f"/tmp/{temp_id}_{file.filename}"
+        # Inputs and outputs live in this request's scratch directory
+        workdir = scratch_dir()
+        for idx, file in enumerate(files):
+            filename = safe_filename(file.filename, f"document_{idx}")
+            input_path = os.path.join(workdir, f"{idx}_{filename}")
             file.save(input_path)
 
             # LibreOffice conversion
-            subprocess.run([
-                "soffice",
-                "--headless",
-                "--convert-to", "pdf",
-                "--outdir", "/tmp",
-                input_path
-            ], check=True)
+            with track_subprocess("soffice"):
+                run_subprocess([
+                    "soffice",
+                    # Own profile per request: concurrent soffice runs sharing
+                    # one profile fail without producing output
+                    f"-env:UserInstallation=file://{workdir}/lo_profile",
+                    "--headless",
+                    "--convert-to", "pdf",
+                    "--outdir", workdir,
+                    input_path
+                ], step="soffice", check=True)
 
             pdf_path = input_path.rsplit(".", 1)[0] + ".pdf"
             temp_pdf_paths.append(pdf_path)
 
         # Merge PDFs if multiple
         if len(temp_pdf_paths) > 1:
-            merged_pdf_path = f"/tmp/{uuid.uuid4()}_merged.pdf"
+            merged_pdf_path = os.path.join(workdir, "merged.pdf")
             merger = PdfMerger()
             for pdf in temp_pdf_paths:
                 merger.append(pdf)
@@ -50,5 +60,8 @@ def excel_to_pdf():
         # Single PDF
         return send_file(temp_pdf_paths[0], as_attachment=True, download_name="converted.pdf")
 
+    except DeadlineExceeded:
+        raise
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,7 +1,6 @@
 from flask import Blueprint, request, send_file, jsonify
 from PyPDF2 import PdfReader, PdfWriter
-import tempfile
-import os
+from services.scratch import scratch_path
 
 extract_pages_bp = Blueprint("extract_pages", __name__, url_prefix="/extract-pages")
 
@@ -30,24 +29,25 @@ def extract_pages():
 
     file = request.files["file"]
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_in:
-        file.save(temp_in.name)
-        reader = PdfReader(temp_in.name)
-        writer = PdfWriter()
+    input_path = scratch_path("input.pdf")
+    output_path = scratch_path("extracted_pages.pdf")
 
-        pages = parse_pages(pages_str, len(reader.pages))
-        if not pages:
-            return jsonify({"error": "Invalid page range"}), 400
+    file.save(input_path)
+    reader = PdfReader(input_path)
+    writer = PdfWriter()
 
-        for i in pages:
-            writer.add_page(reader.pages[i])
+    pages = parse_pages(pages_str, len(reader.pages))
+    if not pages:
+        return jsonify({"error": "Invalid page range"}), 400
 
-        temp_out = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        with open(temp_out.name, "wb") as f:
-            writer.write(f)
+    for i in pages:
+        writer.add_page(reader.pages[i])
+
+    with open(output_path, "wb") as f:
+        writer.write(f)
 
     return send_file(
-        temp_out.name,
+        output_path,
         as_attachment=True,
         download_name="extracted_pages.pdf"
     )
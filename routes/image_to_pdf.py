@@ -1,6 +1,10 @@
 from flask import Blueprint, request, send_file
-from PIL import Image
-from io import BytesIO
+from services.image_pdf import FIT_MODES, MAX_DECODE_DIM, PAGE_SIZES, add_image_page
+from services.memory import check_budget, estimate_image, image_info
+from services.metrics import StageTimer, observe_pages
+from services.scratch import scratch_path
+from services.uploads import upload_size
+import fitz  # PyMuPDF
 
 image_to_pdf_bp = Blueprint('image_to_pdf', __name__)
 
@@ -13,15 +17,62 @@ def image_to_pdf():
     if not images:
         return {"error": "No images uploaded"}, 400
 
-    pil_images = []
-    for img_file in images:
-        img = Image.open(img_file).convert("RGB")
-        pil_images.append(img)
+    # Page layout options
+    page_size = request.form.get("pageSize", "auto").lower()
+    orientation = request.form.get("orientation", "auto").lower()
+    fit = request.form.get("fit", "contain").lower()
+    try:
+        margin = float(request.form.get("margin", 0))
+        dpi = float(request.form.get("dpi", 72))
+    except ValueError:
+        return {"error": "margin and dpi must be numbers"}, 400
 
-    pdf_bytes = BytesIO()
-    if pil_images:
-        first_image, *rest_images = pil_images
-        first_image.save(pdf_bytes, format="PDF", save_all=True, append_images=rest_images)
+    if page_size != "auto" and page_size not in PAGE_SIZES:
+        return {"error": f"Unsupported page size '{page_size}'"}, 400
+    if orientation not in ("auto", "portrait", "landscape"):
+        return {"error": f"Unsupported orientation '{orientation}'"}, 400
+    if fit not in FIT_MODES:
+        return {"error": f"Unsupported fit '{fit}'"}, 400
+    if margin < 0 or dpi <= 0:
+        return {"error": "Invalid margin or dpi"}, 400
 
-    pdf_bytes.seek(0)
-    return send_file(pdf_bytes, mimetype="application/pdf", as_attachment=True, download_name="converted.pdf")
+    observe_pages(len(images))
+    timer = StageTimer()
+
+    # Working set: the largest single decode plus the compressed streams the
+    # document accumulates and its output copy
+    largest_decode, total_bytes = 0, 0
+    with timer.stage("estimate"):
+        for img_file in images:
+            try:
+                fmt, width, height, channels = image_info(img_file)
+            except Exception as e:
+                return {"error": f"Could not read image {img_file.filename}: {e}"}, 400
+            if fmt == "JPEG":
+                # Embedded as-is, or draft-decoded to at most MAX_DECODE_DIM
+                scale = min(1, MAX_DECODE_DIM / max(width, height, 1))
+                width, height = int(width * scale), int(height * scale)
+            largest_decode = max(largest_decode, estimate_image(width, height, channels, copies=2))
+            total_bytes += upload_size(img_file)
+    check_budget(largest_decode + total_bytes * 2, "These images")
+
+    # One image in memory at a time; the document only holds compressed streams
+    doc = fitz.open()
+    try:
+        for img_file in images:
+            data = img_file.read()
+            try:
+                with timer.stage("embed"):
+                    add_image_page(doc, data, dpi=dpi, page_size=page_size,
+                                   orientation=orientation, fit=fit, margin=margin)
+            except Exception as e:
+                return {"error": f"Could not read image {img_file.filename}: {e}"}, 400
+            del data
+
+        output_path = scratch_path("converted.pdf")
+        with timer.stage("write"):
+            doc.save(output_path, garbage=1, deflate=True)
+    finally:
+        doc.close()
+
+    return send_file(output_path, mimetype="application/pdf", as_attachment=True, download_name="converted.pdf")
@@ -0,0 +1,32 @@
+from flask import Blueprint, request, jsonify
+import pikepdf
+from services.metrics import StageTimer, observe_pages
+from services.pdf_inspection import inspect_pdf
+from services.uploads import upload_size, upload_source
+
+inspect_pdf_bp = Blueprint("inspect_pdf", __name__, url_prefix="/inspect-pdf")
+
+@inspect_pdf_bp.route("", methods=["POST"])
+def inspect():
+    """
+    Page count, page sizes and content flags, encryption and linearization
+    from the xref and page tree only (no rendering, no OCR)
+    """
+    if "file" not in request.files:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    file = request.files["file"]
+    timer = StageTimer()
+
+    try:
+        # qpdf reads the spooled upload file directly when it is on disk
+        with timer.stage("inspect"), upload_source(file) as source:
+            report = inspect_pdf(source, password=request.form.get("password", ""))
+    except pikepdf.PdfError as e:
+        # qpdf prefixes messages with the source name (a temp path or stream repr)
+        return jsonify({"error": f"Not a readable PDF: {str(e).split(': ', 1)[-1]}"}), 400
+
+    observe_pages(report["page_count"])
+    report["file_size"] = upload_size(file)
+    report["timings"] = timer.timings
+    return jsonify(report)
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, send_file, jsonify
 from pypdf import PdfWriter
-import io
+from services.memory import check_budget, estimate_pdf
+from services.scratch import scratch_path
+from services.uploads import upload_size
 
 merge_pdf_bp = Blueprint("merge_pdf", __name__)
 
@@ -10,13 +12,15 @@ def merge_pdfs():
         return jsonify({"error":"No PDF files uploaded"}),400
     pdf_files = request.files.getlist("files")
     if len(pdf_files)<2: return jsonify({"error":"Upload at least two PDFs"}),400
-    writer = PdfWriter()
     for pdf in pdf_files:
         if not pdf.filename.lower().endswith(".pdf"):
             return jsonify({"error":"Only PDF files allowed"}),400
+    # pypdf holds every parsed input until the write; the output goes to disk
+    check_budget(estimate_pdf(sum(upload_size(pdf) for pdf in pdf_files), 0), "These PDFs")
+    writer = PdfWriter()
+    for pdf in pdf_files:
         writer.append(pdf)
-    output = io.BytesIO()
-    writer.write(output)
+    output_path = scratch_path("merged.pdf")
+    writer.write(output_path)
     writer.close()
-    output.seek(0)
-    return send_file(output,mimetype="application/pdf",as_attachment=True,download_name="merged.pdf")
+    return send_file(output_path,mimetype="application/pdf",as_attachment=True,download_name="merged.pdf")
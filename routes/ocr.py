@@ -1,11 +1,21 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from PIL import Image
 import cv2
 import numpy as np
 import pytesseract
 import platform
 import os
-import subprocess
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from services.admission import admit
+from services.deadline import DeadlineExceeded, check, timeout
+from services.memory import MemoryBudgetError, check_budget, decoded_image_estimate
+from services.uploads import decode_image, upload_limits, upload_size
+from services.language import detect_image_languages, installed_languages
+from services.ocr_output import OUTPUT_FORMATS, parse_ocr_data, to_alto, to_hocr, transform_boxes
+from services.enhancement import DEFAULT_PROFILE, StageTimer, denoise, resolve_profile
 
 ocr_bp = Blueprint("ocr", __name__)
 
@@ -31,15 +41,10 @@ def setup_tesseract():
     # Linux/Production
     else:
         # Check if tesseract is in PATH
-        try:
-            result = subprocess.run(['which', 'tesseract'], 
-                                  capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                tess_path = result.stdout.strip()
-                print(f"✓ Tesseract found at: {tess_path}")
-                return True
-        except Exception as e:
-            print(f"⚠ Error checking tesseract: {e}")
+        tess_path = shutil.which("tesseract")
+        if tess_path:
+            print(f"✓ Tesseract found at: {tess_path}")
+            return True
         
         # Try common Linux paths
         possible_paths = [
@@ -56,54 +61,96 @@ def setup_tesseract():
         print("⚠ Tesseract not found in common locations")
         return False
 
-# Setup on module load
-TESSERACT_AVAILABLE = setup_tesseract()
+_tesseract_available = None
+
+def tesseract_available():
+    """Locate Tesseract on first use instead of at import time"""
+    global _tesseract_available
+    if _tesseract_available is None:
+        _tesseract_available = setup_tesseract()
+    return _tesseract_available
+
+OCR_MAX_UPLOAD_MB = 25
+
+# Deskew angle estimation works on a downsampled binary page
+DESKEW_MAX_DIM = 800
+DESKEW_MAX_ANGLE = 10.0
+DESKEW_CACHE_SIZE = 32
 
-def deskew_image(image):
-    """Automatically deskew/rotate the image for better OCR"""
-    # Convert to grayscale if needed
+_skew_cache = OrderedDict()
+_skew_cache_lock = threading.Lock()
+
+
+def _projection_score(binary, angle):
+    """Variance of row sums after rotating by angle (sharp peaks = aligned text lines)"""
+    h, w = binary.shape
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    rotated = cv2.warpAffine(binary, M, (w, h), flags=cv2.INTER_NEAREST, borderValue=0)
+    return float(np.var(rotated.sum(axis=1, dtype=np.float64)))
+
+
+def estimate_skew_angle(image):
+    """Estimate the deskew angle with a coarse-to-fine projection-profile search"""
     if len(image.shape) == 3:
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     else:
-        gray = image.copy()
-    
-    # Threshold
-    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
-    
-    # Find all coordinates of rotated text
-    coords = np.column_stack(np.where(thresh > 0))
-    
-    # Calculate rotation angle
-    if len(coords) > 0:
-        angle = cv2.minAreaRect(coords)[-1]
-        
-        # Correct angle
-        if angle < -45:
-            angle = -(90 + angle)
-        else:
-            angle = -angle
-        
-        # Only deskew if angle is significant (more than 0.5 degrees)
-        if abs(angle) > 0.5:
-            (h, w) = image.shape[:2]
-            center = (w // 2, h // 2)
-            M = cv2.getRotationMatrix2D(center, angle, 1.0)
-            rotated = cv2.warpAffine(image, M, (w, h),
-                                    flags=cv2.INTER_CUBIC,
-                                    borderMode=cv2.BORDER_REPLICATE)
-            print(f"  Deskewed by {angle:.2f} degrees")
-            return rotated
+        gray = image
+
+    h, w = gray.shape
+    scale = min(1.0, DESKEW_MAX_DIM / max(h, w))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+    binary = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+
+    key = hashlib.blake2b(binary.tobytes(), digest_size=16).hexdigest() + str(binary.shape)
+    with _skew_cache_lock:
+        if key in _skew_cache:
+            _skew_cache.move_to_end(key)
+            return _skew_cache[key]
+
+    if not binary.any():
+        angle = 0.0
+    else:
+        # Coarse pass at 1 degree, then refine around the best at 0.1 degree
+        coarse = np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + 0.5, 1.0)
+        best = max(coarse, key=lambda a: _projection_score(binary, a))
+        fine = np.arange(best - 1.0, best + 1.05, 0.1)
+        angle = float(max(fine, key=lambda a: _projection_score(binary, a)))
+
+    with _skew_cache_lock:
+        _skew_cache[key] = angle
+        if len(_skew_cache) > DESKEW_CACHE_SIZE:
+            _skew_cache.popitem(last=False)
+
+    return angle
+
+
+def deskew_image(image, angle=None, transform=None):
+    """Automatically deskew/rotate the image for better OCR.
+    A transform dict, when given, receives the rotation matrix under "deskew"."""
+    if angle is None:
+        angle = estimate_skew_angle(image)
+
+    # Only deskew if angle is significant (more than 0.5 degrees)
+    if abs(angle) > 0.5:
+        (h, w) = image.shape[:2]
+        center = (w // 2, h // 2)
+        M = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotated = cv2.warpAffine(image, M, (w, h),
+                                flags=cv2.INTER_CUBIC,
+                                borderMode=cv2.BORDER_REPLICATE)
+        if transform is not None:
+            transform["deskew"] = M
+        print(f"  Deskewed by {angle:.2f} degrees")
+        return rotated
     
     return image
 
-def remove_noise(image):
+def remove_noise(image, profile=DEFAULT_PROFILE, timings=None):
     """Remove noise while preserving text quality"""
-    # Use Non-local Means Denoising - gentle settings
-    if len(image.shape) == 3:
-        denoised = cv2.fastNlMeansDenoisingColored(image, None, 6, 6, 7, 21)
-    else:
-        denoised = cv2.fastNlMeansDenoising(image, None, 6, 7, 21)
-    return denoised
+    # Non-local Means Denoising with gentle settings, shared with /scan
+    return denoise(image, strength=6, profile=profile, timings=timings)
 
 def enhance_contrast(gray):
     """Enhance contrast using multiple techniques"""
@@ -134,13 +181,17 @@ def get_optimal_threshold(gray):
     
     return thresh
 
-def preprocess_for_ocr(img, method='auto'):
-    """Advanced preprocessing for better OCR accuracy with multiple methods"""
+def preprocess_for_ocr(img, method='auto', profile=DEFAULT_PROFILE, timings=None, transform=None):
+    """Advanced preprocessing for better OCR accuracy with multiple methods.
+    transform (a dict) receives the deskew rotation, if one was applied."""
+    timer = StageTimer(timings)
+
     # Remove noise first
-    denoised = remove_noise(img)
+    denoised = remove_noise(img, profile, timer.timings)
     
     # Deskew the image
-    deskewed = deskew_image(denoised)
+    with timer.stage("deskew"):
+        deskewed = deskew_image(denoised, transform=transform)
     
     # Convert to grayscale
     if len(deskewed.shape) == 3:
@@ -191,7 +242,43 @@ def preprocess_simple(img):
     
     return sharpened
 
+def run_ocr_method(name, processed, config, original_width, lang='eng', timings=None, deskew=None):
+    """Run one image_to_data pass and parse it; boxes are mapped back to the original
+    image, undoing the upscale and, when deskew (its rotation matrix) is given, the rotation"""
+    with StageTimer(timings).stage("ocr"):
+        try:
+            data = pytesseract.image_to_data(
+                Image.fromarray(processed), config=config, lang=lang,
+                output_type=pytesseract.Output.DICT,
+                timeout=timeout("tesseract") or 0
+            )
+        except RuntimeError:
+            # pytesseract kills tesseract on timeout; report it as the deadline
+            check("tesseract")
+            raise
+    scale = original_width / processed.shape[1]
+    result = parse_ocr_data(data, scale=scale)
+    if deskew is not None:
+        # warpAffine kept the original size, so only the rotation is left to undo
+        original_height = int(round(processed.shape[0] * scale))
+        transform_boxes(result, cv2.invertAffineTransform(deskew).tolist(), original_width, original_height)
+    result["method"] = name
+    print(f"  Result: {len(result['text'])} chars, confidence {result['mean_confidence']}")
+    return result
+
+def result_score(result):
+    """Characters read, each weighted by its word's confidence (0-100).
+    A variant that reads a few words confidently does not beat one that
+    reads the whole page slightly less confidently."""
+    return round(sum(
+        len(word["text"]) * word["confidence"] / 100
+        for line in result["lines"]
+        for word in line["words"]
+    ), 2)
+
 @ocr_bp.route("/ocr", methods=["POST", "OPTIONS"])
+@upload_limits(max_mb=OCR_MAX_UPLOAD_MB)
+@admit("tesseract")
 def ocr_extract():
     """Extract text from image using Tesseract OCR"""
     if request.method == "OPTIONS":
@@ -201,7 +288,7 @@ def ocr_extract():
         print("\n=== OCR REQUEST ===")
         
         # Check if Tesseract is available
-        if not TESSERACT_AVAILABLE:
+        if not tesseract_available():
             print("ERROR: Tesseract not available")
             return jsonify({
                 "error": "Tesseract OCR is not installed on the server",
@@ -213,12 +300,16 @@ def ocr_extract():
             return jsonify({"error": "No image uploaded"}), 400
         
         file = request.files["image"]
-        img_bytes = file.read()
-        print(f"Received image: {len(img_bytes)} bytes")
+        print(f"Received image: {upload_size(file)} bytes")
+        
+        timings = {}
+        timer = StageTimer(timings)
+        # Grayscale, denoised, thresholded and per-method copies coexist
+        check_budget(decoded_image_estimate(file, copies=8), "This image")
         
-        # Decode image
-        np_img = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
+        # Decode image straight from the (possibly disk-spooled) upload
+        with timer.stage("decode"):
+            img = decode_image(file)
         
         if img is None:
             print("ERROR: Could not decode image")
@@ -229,49 +320,77 @@ def ocr_extract():
         
         # Get preprocessing method from request (optional)
         preprocess_method = request.form.get("method", "auto")
+        profile = resolve_profile(request.form.get("profile"))
         
-        # Try multiple preprocessing methods and PSM modes for best results
+        # Language models: explicit "eng+hin" style string, or "auto" for OSD detection
+        lang = request.form.get("lang", "auto").strip() or "auto"
+        osd = None
+        if lang == "auto":
+            with timer.stage("detect_language"):
+                lang, osd = detect_image_languages(img)
+            print(f"Detected script: {osd['script']} -> lang={lang}")
+        else:
+            installed = installed_languages()
+            missing = [l for l in lang.split("+") if installed and l not in installed]
+            if missing:
+                return jsonify({
+                    "error": "Language packs not installed",
+                    "missing": missing,
+                    "installed": installed
+                }), 400
+        
+        output_format = request.form.get("output", "text").lower()
+        if output_format not in OUTPUT_FORMATS:
+            return jsonify({
+                "error": f"Unsupported output format '{output_format}'",
+                "supported": list(OUTPUT_FORMATS)
+            }), 400
+        
+        # Try multiple preprocessing methods and PSM modes for best results.
+        # Each method runs a single image_to_data pass; text, confidence and
+        # boxes are all derived from it.
         results = []
         
         # Method 1: Advanced preprocessing with PSM 3 (auto page segmentation)
         try:
             print("\n--- Method 1: Advanced + PSM 3 ---")
-            processed1 = preprocess_for_ocr(img, method='auto')
-            pil_img1 = Image.fromarray(processed1)
+            with timer.stage("preprocess"):
+                transform1 = {}
+                processed1 = preprocess_for_ocr(img, method='auto', profile=profile, timings=timings, transform=transform1)
             
             # PSM 3: Fully automatic page segmentation (best for mixed layouts)
-            config1 = r'--oem 3 --psm 3'
-            text1 = pytesseract.image_to_string(pil_img1, config=config1, lang='eng').strip()
-            results.append(('Advanced+PSM3', text1, len(text1)))
-            print(f"  Result: {len(text1)} chars")
+            results.append(run_ocr_method('Advanced+PSM3', processed1, r'--oem 3 --psm 3', w, lang=lang, timings=timings,
+                                          deskew=transform1.get("deskew")))
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"  Method 1 failed: {e}")
         
         # Method 2: Simple preprocessing with PSM 1 (auto with OSD)
         try:
             print("\n--- Method 2: Simple + PSM 1 ---")
-            processed2 = preprocess_simple(img)
-            pil_img2 = Image.fromarray(processed2)
+            with timer.stage("preprocess"):
+                processed2 = preprocess_simple(img)
             
             # PSM 1: Auto with orientation and script detection
-            config2 = r'--oem 3 --psm 1'
-            text2 = pytesseract.image_to_string(pil_img2, config=config2, lang='eng').strip()
-            results.append(('Simple+PSM1', text2, len(text2)))
-            print(f"  Result: {len(text2)} chars")
+            results.append(run_ocr_method('Simple+PSM1', processed2, r'--oem 3 --psm 1', w, lang=lang, timings=timings))
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"  Method 2 failed: {e}")
         
         # Method 3: Advanced preprocessing with PSM 6 (uniform block)
         try:
             print("\n--- Method 3: Advanced + PSM 6 ---")
-            processed3 = preprocess_for_ocr(img, method='auto')
-            pil_img3 = Image.fromarray(processed3)
+            with timer.stage("preprocess"):
+                transform3 = {}
+                processed3 = preprocess_for_ocr(img, method='auto', profile=profile, timings=timings, transform=transform3)
             
             # PSM 6: Uniform block of text
-            config3 = r'--oem 3 --psm 6'
-            text3 = pytesseract.image_to_string(pil_img3, config=config3, lang='eng').strip()
-            results.append(('Advanced+PSM6', text3, len(text3)))
-            print(f"  Result: {len(text3)} chars")
+            results.append(run_ocr_method('Advanced+PSM6', processed3, r'--oem 3 --psm 6', w, lang=lang, timings=timings,
+                                          deskew=transform3.get("deskew")))
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"  Method 3 failed: {e}")
         
@@ -290,15 +409,13 @@ def ocr_extract():
                 gray_direct = cv2.resize(gray_direct, None, fx=scale, fy=scale, 
                                         interpolation=cv2.INTER_CUBIC)
             
-            pil_img4 = Image.fromarray(gray_direct)
-            config4 = r'--oem 3 --psm 3'
-            text4 = pytesseract.image_to_string(pil_img4, config=config4, lang='eng').strip()
-            results.append(('Direct+PSM3', text4, len(text4)))
-            print(f"  Result: {len(text4)} chars")
+            results.append(run_ocr_method('Direct+PSM3', gray_direct, r'--oem 3 --psm 3', w, lang=lang, timings=timings))
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"  Method 4 failed: {e}")
         
-        # Choose the best result (longest text with reasonable content)
+        # Choose the best result
         if not results:
             return jsonify({
                 "error": "All OCR methods failed",
@@ -306,25 +423,53 @@ def ocr_extract():
                 "length": 0
             }), 500
         
-        # Sort by length and pick the longest
-        results.sort(key=lambda x: x[2], reverse=True)
-        best_method, best_text, best_length = results[0]
+        # Pick the most confidently read text; mean confidence breaks ties
+        results.sort(key=lambda r: (result_score(r), r["mean_confidence"]), reverse=True)
+        best = results[0]
+        best_method, best_text, best_length = best["method"], best["text"], len(best["text"])
         
-        print(f"\n✓ Best result from: {best_method}")
+        print(f"\n✓ Best result from: {best_method} (confidence {best['mean_confidence']})")
         print(f"✓ Extracted {best_length} characters")
         if best_length > 0:
             print(f"Preview: {best_text[:200]}...")
         
+        if output_format == "hocr":
+            return Response(to_hocr(best, w, h), mimetype="text/html")
+        if output_format == "alto":
+            return Response(to_alto(best, w, h), mimetype="application/xml")
+        
         # Return all results for debugging
-        all_results = [{"method": r[0], "length": r[2]} for r in results]
+        all_results = [
+            {"method": r["method"], "length": len(r["text"]), "confidence": r["mean_confidence"],
+             "score": result_score(r)}
+            for r in results
+        ]
         
-        return jsonify({
+        response = {
             "success": True,
             "text": best_text,
             "length": best_length,
+            "confidence": best["mean_confidence"],
             "method_used": best_method,
+            "lang": lang,
+            "script": osd["script"] if osd else None,
+            "profile": profile,
+            "timings": timings,
             "all_methods": all_results
-        })
+        }
+        if output_format == "json":
+            response["width"] = w
+            response["height"] = h
+            response["lines"] = best["lines"]
+        
+        return jsonify(response)
+    
+    except DeadlineExceeded:
+        raise
+    
+    except MemoryBudgetError as e:
+        print(f"ERROR: {e}")
+        return jsonify({"error": str(e)}), 413
     
     except pytesseract.TesseractNotFoundError as e:
         print(f"ERROR: Tesseract not found - {e}")
@@ -354,7 +499,7 @@ def tesseract_check():
         
         return jsonify({
             "installed": True,
-            "available": TESSERACT_AVAILABLE,
+            "available": tesseract_available(),
             "version": str(version),
             "languages": langs,
             "path": pytesseract.pytesseract.tesseract_cmd if hasattr(pytesseract.pytesseract, 'tesseract_cmd') else "default"
@@ -1,15 +1,21 @@
 from flask import Blueprint, request, send_file, jsonify
 from werkzeug.utils import secure_filename
-import tempfile
 import os
 import traceback
 import subprocess
-import ocrmypdf
+from services.admission import admit
+from services.deadline import DeadlineExceeded, run_subprocess, timeout
+from services.language import detect_pdf_languages, installed_languages
+from services.metrics import track_subprocess
+from services.scratch import scratch_dir
 
 ocr_pdf_bp = Blueprint("ocr_pdf", __name__, url_prefix="/ocr-pdf")
 
 ALLOWED_EXTENSIONS = {"pdf"}
 
+OCR_PAGE_TIMEOUT = 300               # seconds of tesseract per page
+OCRMYPDF_MISSING_DEPENDENCY = 3      # ocrmypdf exit code
+
 # ----------------------------------
 # LANGUAGE MAP (frontend → tesseract)
 # ----------------------------------
@@ -35,23 +41,10 @@ def allowed_file(filename):
 
 def check_tesseract_languages():
     """Return installed Tesseract language codes"""
-    try:
-        result = subprocess.run(
-            ["tesseract", "--list-langs"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        langs = [
-            line.strip()
-            for line in result.stdout.splitlines()
-            if line.strip() and not line.lower().startswith("list of")
-        ]
-        return langs
-    except Exception:
-        return []
+    return installed_languages()
 
 @ocr_pdf_bp.route("/", methods=["POST"])
+@admit("tesseract")
 def ocr_pdf():
     try:
         # --------------------
@@ -71,9 +64,11 @@ def ocr_pdf():
         # --------------------
         # Parse languages
         # --------------------
+        # "auto" detects the script from the first page after upload
         languages_input = request.form.get("languages", "eng")
+        auto_detect = languages_input.strip().lower() == "auto"
         language_codes = [l.strip() for l in languages_input.split(",")]
-        tesseract_langs = [LANGUAGE_MAP.get(l, l) for l in language_codes]
+        tesseract_langs = [] if auto_detect else [LANGUAGE_MAP.get(l, l) for l in language_codes]
         language_string = "+".join(tesseract_langs)
 
         # --------------------
@@ -92,49 +87,68 @@ def ocr_pdf():
         # --------------------
         # OCR processing
         # --------------------
-        with tempfile.TemporaryDirectory() as tmp:
-            input_path = os.path.join(tmp, secure_filename(file.filename))
-            output_path = os.path.join(tmp, f"searchable_{secure_filename(file.filename)}")
-            file.save(input_path)
-
-            try:
-                # KEY FIX: Use parameters that guarantee text selection
-                ocrmypdf.ocr(
-                    input_path,
-                    output_path,
-                    language=language_string,
-                    force_ocr=True,           # run OCR on all pages
-                    deskew=True,              # auto-rotate / deskew pages
-                    rotate_pages=True,        # auto-rotate pages
-                    clean=True,               # clean pages before OCR (IMPORTANT)
-                    remove_background=False,  # keep original quality
-                    optimize=0,               # NO optimization to preserve text (CRITICAL)
-                    output_type="pdf",        # standard PDF
-                    skip_text=False,          # don't skip existing text
-                    redo_ocr=False,           # don't redo if text exists
-                    sidecar=None,             # no text file needed
-                    pdf_renderer="auto",      # let ocrmypdf choose best renderer
-                    invalidate_digital_signatures=True,  # allow processing signed PDFs
-                    tesseract_timeout=300     # 5 min timeout per page
-                )
-            except Exception as e:
-                msg = str(e).lower()
+        # Request scratch space, removed after the response is sent
+        tmp = scratch_dir()
+        input_path = os.path.join(tmp, secure_filename(file.filename))
+        output_path = os.path.join(tmp, f"searchable_{secure_filename(file.filename)}")
+        file.save(input_path)
+
+        if auto_detect:
+            language_string, _ = detect_pdf_languages(input_path)
+            print(f"Detected OCR languages: {language_string}")
+
+        # Per-page limit, never beyond what is left of the request deadline.
+        # ocrmypdf treats --tesseract-timeout 0 as "skip OCR", which would
+        # return a PDF without a text layer instead of a 504.
+        page_timeout = int(timeout("ocrmypdf", cap=OCR_PAGE_TIMEOUT))
+        if page_timeout < 1:
+            raise DeadlineExceeded("ocrmypdf")
+
+        # KEY FIX: Use parameters that guarantee text selection.
+        # ocrmypdf runs as a child process (not the in-process API) so the
+        # request deadline can kill it with the tesseract/gs jobs it starts.
+        cmd = [
+            "ocrmypdf",
+            "-l", language_string,
+            "--force-ocr",                      # run OCR on all pages
+            "--deskew",                         # auto-rotate / deskew pages
+            "--rotate-pages",                   # auto-rotate pages
+            "--clean",                          # clean pages before OCR (IMPORTANT)
+            "--optimize", "0",                  # NO optimization to preserve text (CRITICAL)
+            "--output-type", "pdf",             # standard PDF
+            "--pdf-renderer", "auto",           # let ocrmypdf choose best renderer
+            "--invalidate-digital-signatures",  # allow processing signed PDFs
+            "--tesseract-timeout", str(page_timeout),
+            input_path,
+            output_path
+        ]
+        with track_subprocess("ocrmypdf") as run:
+            result = run_subprocess(cmd, step="ocrmypdf", capture_output=True, text=True)
+            if result.returncode != 0:
+                run.fail()
+
+        if result.returncode != 0:
+            msg = result.stderr.lower()
+            if result.returncode == OCRMYPDF_MISSING_DEPENDENCY:
                 if "tesseract" in msg:
                     return jsonify({"error": "Tesseract OCR not available"}), 500
                 if "ghostscript" in msg:
                     return jsonify({"error": "Ghostscript missing"}), 500
-                traceback.print_exc()
-                return jsonify({
-                    "error": "OCR processing failed",
-                    "details": str(e)
-                }), 500
-
-            return send_file(
-                output_path,
-                mimetype="application/pdf",
-                as_attachment=True,
-                download_name=f"searchable_{secure_filename(file.filename)}"
-            )
+            print(result.stderr)
+            return jsonify({
+                "error": "OCR processing failed",
+                "details": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit code {result.returncode}"
+            }), 500
+
+        return send_file(
+            output_path,
+            mimetype="application/pdf",
+            as_attachment=True,
+            download_name=f"searchable_{secure_filename(file.filename)}"
+        )
+
+    except DeadlineExceeded:
+        raise
 
     except Exception as e:
         traceback.print_exc()
@@ -146,7 +160,8 @@ def tesseract_check():
         version = subprocess.run(
             ["tesseract", "--version"],
             capture_output=True,
-            text=True
+            text=True,
+            timeout=10
         ).stdout.splitlines()[0]
 
         langs = check_tesseract_languages()
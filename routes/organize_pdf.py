@@ -2,9 +2,8 @@
 
 from flask import Blueprint, request, send_file, jsonify
 from PyPDF2 import PdfReader, PdfWriter
-import tempfile
 import json
-import os
+from services.scratch import scratch_path
 
 organize_pdf_bp = Blueprint(
     "organize_pdf",
@@ -82,28 +81,17 @@ def organize_pdf():
                 if rotation != 0:
                     blank_page.rotate(rotation)
 
-        # Write to temporary file
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        writer.write(tmp)
-        tmp.close()
+        # Write to request scratch space (removed after the response closes)
+        output_path = scratch_path("organized.pdf")
+        with open(output_path, "wb") as f:
+            writer.write(f)
 
-        # Send file and schedule cleanup
-        response = send_file(
-            tmp.name,
+        return send_file(
+            output_path,
             as_attachment=True,
             download_name="organized.pdf",
             mimetype="application/pdf"
         )
-        
-        # Clean up temp file after response
-        @response.call_on_close
-        def cleanup():
-            try:
-                os.unlink(tmp.name)
-            except:
-                pass
-        
-        return response
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -1,48 +1,77 @@
 from flask import Blueprint, request, send_file, jsonify
-import tempfile
+import contextvars
 import os
 import subprocess
-from io import BytesIO
+from contextlib import ExitStack
 import fitz  # PyMuPDF
+import pikepdf
+from concurrent.futures import ThreadPoolExecutor
+from services.admission import admit
+from services.cpu_budget import cpu_budget, split_cores
+from services.deadline import DeadlineExceeded, run_subprocess
+from services.language import detect_pdf_languages
+from services.metrics import observe_pages, track_subprocess
+from services.scratch import scratch_dir
 
 pdfa_ocr_bp = Blueprint("pdfa_ocr", __name__)
 
 
 # ------------------ AUTO LANGUAGE DETECTION (fallback) ------------------
 def detect_language(input_pdf):
-    try:
-        doc = fitz.open(input_pdf)
-        page = doc.load_page(0)
-        pix = page.get_pixmap(dpi=150)
-
-        img_path = input_pdf.replace(".pdf", ".png")
-        pix.save(img_path)
-
-        result = subprocess.run(
-            ["tesseract", img_path, "stdout", "--psm", "0"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-
-        os.remove(img_path)
-        output = result.stderr.lower()
+    languages, _ = detect_pdf_languages(input_pdf)
+    return languages
 
-        if "devanagari" in output:
-            return "eng+hin"
-        elif "arabic" in output:
-            return "eng+ara"
-        elif "latin" in output:
-            return "eng"
-        else:
-            return "eng"
 
-    except:
-        return "eng"
+# ------------------ OCR ONE FILE ------------------
+def count_pages(pdf_path):
+    try:
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
+    except Exception:
+        return 1
+
+
+def run_ocrmypdf(input_path, output_path, languages, max_jobs):
+    """Run ocrmypdf with as many --jobs as the shared CPU budget grants"""
+    with cpu_budget.lease(max_jobs) as jobs:
+        cmd = [
+            "ocrmypdf",
+            "--force-ocr",
+            "--jobs", str(jobs),           # Cores leased from the global budget
+            "--skip-text",                 # Skip pages with text
+            "--rotate-pages",
+            "--deskew",
+            "--fast-web-view", "1",
+            "--optimize", "1",             # Faster than level 3
+            "--output-type", "pdfa",
+            "--tesseract-timeout", "90",
+            "-l", languages,
+            input_path,
+            output_path
+        ]
+
+        with track_subprocess("ocrmypdf") as run:
+            result = run_subprocess(cmd, step="ocrmypdf", stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if result.returncode != 0:
+                run.fail()
+        return result
+
+
+# ------------------ MERGE ------------------
+def merge_pdfa(paths, output_path):
+    """Append pages onto the first PDF/A so its OutputIntents and XMP metadata survive"""
+    with ExitStack() as stack:
+        merged = stack.enter_context(pikepdf.open(paths[0]))
+        for p in paths[1:]:
+            # Sources must stay open until save: qpdf copies stream data lazily
+            src = stack.enter_context(pikepdf.open(p))
+            merged.pages.extend(src.pages)
+        merged.save(output_path, linearize=True)
 
 
 # ------------------ MAIN ROUTE ------------------
 @pdfa_ocr_bp.route("/pdfa-ocr", methods=["POST"])
+@admit("tesseract")
 def pdfa_ocr():
 
     files = request.files.getlist("files")
@@ -51,70 +80,59 @@ def pdfa_ocr():
 
     user_lang = request.form.get("lang")
 
+    # Request scratch space: removed after the response has been streamed
+    tmpdir = scratch_dir()
+
     try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-
-            processed_paths = []
-
-            # ---------- PROCESS EACH FILE ----------
-            for idx, file in enumerate(files):
-                input_path = os.path.join(tmpdir, f"input_{idx}.pdf")
-                output_path = os.path.join(tmpdir, f"ocr_{idx}.pdf")
-
-                file.save(input_path)
-
-                languages = user_lang if user_lang else detect_language(input_path)
-
-                cmd = [
-                    "ocrmypdf",
-                    "--force-ocr",
-                    "--jobs", "2",                 # Parallel OCR
-                    "--skip-text",                 # Skip pages with text
-                    "--rotate-pages",
-                    "--deskew",
-                    "--fast-web-view", "1",
-                    "--optimize", "1",             # Faster than level 3
-                    "--output-type", "pdfa",
-                    "--tesseract-timeout", "90",
-                    "-l", languages,
-                    input_path,
-                    output_path
-                ]
-
-                process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-                if process.returncode != 0:
-                    return jsonify({
-                        "error": f"OCR failed for {file.filename}",
-                        "details": process.stderr.decode()
-                    }), 500
-
-                processed_paths.append(output_path)
-
-            # ---------- MERGE IF MULTIPLE FILES ----------
+        input_paths = []
+        processed_paths = []
+
+        # ---------- SAVE UPLOADS ----------
+        for idx, file in enumerate(files):
+            input_path = os.path.join(tmpdir, f"input_{idx}.pdf")
+            file.save(input_path)
+            input_paths.append(input_path)
+            processed_paths.append(os.path.join(tmpdir, f"ocr_{idx}.pdf"))
+
+        # ---------- SPLIT CORES BETWEEN FILES BY PAGE COUNT ----------
+        page_counts = [count_pages(p) for p in input_paths]
+        observe_pages(sum(page_counts))
+        max_jobs = split_cores(page_counts)
+
+        def process(idx):
+            languages = user_lang if user_lang else detect_language(input_paths[idx])
+            return run_ocrmypdf(input_paths[idx], processed_paths[idx], languages, max_jobs[idx])
+
+        # ---------- PROCESS FILES CONCURRENTLY ----------
+        # Each file runs in a copy of this context so it inherits the request deadline
+        with ThreadPoolExecutor(max_workers=min(len(files), cpu_budget.total)) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, process, idx) for idx in range(len(files))]
+            processes = [future.result() for future in futures]
+
+        for file, process in zip(files, processes):
+            if process.returncode != 0:
+                return jsonify({
+                    "error": f"OCR failed for {file.filename}",
+                    "details": process.stderr.decode()
+                }), 500
+
+        # ---------- MERGE IF MULTIPLE FILES ----------
+        if len(processed_paths) == 1:
+            final_output = processed_paths[0]
+        else:
             final_output = os.path.join(tmpdir, "final_output.pdf")
+            merge_pdfa(processed_paths, final_output)
 
-            if len(processed_paths) == 1:
-                final_output = processed_paths[0]
-            else:
-                merger = fitz.open()
-                for p in processed_paths:
-                    merger.insert_pdf(fitz.open(p))
-                merger.save(final_output)
-                merger.close()
-
-            # ---------- RETURN FILE ----------
-            with open(final_output, "rb") as f:
-                pdf_bytes = BytesIO(f.read())
-
-        pdf_bytes.seek(0)
-
+        # ---------- STREAM FILE FROM DISK ----------
         return send_file(
-            pdf_bytes,
+            final_output,
             as_attachment=True,
             download_name="pdfa_searchable.pdf",
             mimetype="application/pdf"
         )
 
+    except DeadlineExceeded:
+        raise
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,7 +1,7 @@
 from flask import Blueprint, request, send_file, jsonify
 from PyPDF2 import PdfReader, PdfWriter
-import tempfile
 import json
+from services.scratch import scratch_path
 
 rotate_pdf_bp = Blueprint(
     "rotate_pdf",
@@ -37,12 +37,12 @@ def rotate_pdf():
             writer.add_page(page)
             page_index += 1
 
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    writer.write(tmp)
-    tmp.close()
+    output_path = scratch_path("rotated.pdf")
+    with open(output_path, "wb") as f:
+        writer.write(f)
 
     return send_file(
-        tmp.name,
+        output_path,
         as_attachment=True,
         download_name="rotated.pdf",
         mimetype="application/pdf"
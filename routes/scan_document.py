@@ -2,10 +2,29 @@ from flask import Blueprint, request, send_file, jsonify
 import cv2
 import numpy as np
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import fitz  # PyMuPDF
+import contextvars
 import io
+import json
+import numbers
+import os
+from services.admission import admit
+from services.image_pdf import add_jpeg_page
+from services.memory import check_budget, decoded_image_estimate
+from services.metrics import observe_pages
+from services.uploads import decode_image, upload_limits
+from services.enhancement import DEFAULT_PROFILE, StageTimer, enhance_image, resolve_profile
 
 scan_doc_bp = Blueprint("scan_doc", __name__)
 
+# Worker pool size for /scan-batch (OpenCV releases the GIL, so threads scale)
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", os.cpu_count() or 2))
+SCAN_BATCH_MAX_IMAGES = 50
+SCAN_PDF_DPI = 300
+SCAN_MAX_UPLOAD_MB = 25
+SCAN_BATCH_MAX_UPLOAD_MB = 300
+
 def order_points(pts):
     """Order points in consistent order: top-left, top-right, bottom-right, bottom-left"""
     rect = np.zeros((4, 2), dtype="float32")
@@ -80,29 +99,12 @@ def detect_document_contour(img):
     
     return None
 
-def enhance_document(img):
+def enhance_document(img, profile=DEFAULT_PROFILE, timings=None):
     """Enhanced document processing with better quality preservation"""
-    # Convert to LAB color space for better luminance processing
-    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    
-    # Apply CLAHE with gentler parameters
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    l = clahe.apply(l)
-    
-    # Merge back
-    img = cv2.cvtColor(cv2.merge((l, a, b)), cv2.COLOR_LAB2BGR)
-    
-    # Gentle sharpening using unsharp mask
-    gaussian = cv2.GaussianBlur(img, (0, 0), 2.0)
-    img = cv2.addWeighted(img, 1.5, gaussian, -0.5, 0)
-    
-    # Denoise while preserving edges
-    img = cv2.fastNlMeansDenoisingColored(img, None, 10, 10, 7, 21)
-    
-    return img
+    # CLAHE on luminance, unsharp mask, then profile-dependent denoise
+    return enhance_image(img, profile=profile, denoise_strength=10, timings=timings)
 
-def adaptive_document_enhancement(img):
+def adaptive_document_enhancement(img, profile=DEFAULT_PROFILE, timings=None):
     """Apply adaptive enhancement based on image characteristics"""
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     
@@ -125,20 +127,20 @@ def adaptive_document_enhancement(img):
         img = cv2.filter2D(img, -1, kernel)
     else:
         # Use gentler enhancement
-        img = enhance_document(img)
+        img = enhance_document(img, profile, timings)
     
     return img
 
 @scan_doc_bp.route("/detect-corners", methods=["POST"])
+@upload_limits(max_mb=SCAN_MAX_UPLOAD_MB)
+@admit("opencv")
 def detect_corners():
     """Detect document corners for cropping"""
     if "image" not in request.files:
         return jsonify({"error": "No image uploaded"}), 400
     
     file = request.files["image"]
-    img_bytes = file.read()
-    np_img = np.frombuffer(img_bytes, np.uint8)
-    img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
+    img = decode_image(file)
     
     if img is None:
         return jsonify({"error": "Invalid image"}), 400
@@ -182,6 +184,8 @@ def detect_corners():
         })
 
 @scan_doc_bp.route("/scan", methods=["POST"])
+@upload_limits(max_mb=SCAN_MAX_UPLOAD_MB)
+@admit("opencv")
 def scan_and_convert():
     """Process scanned document with high quality output"""
     if "image" not in request.files:
@@ -190,42 +194,170 @@ def scan_and_convert():
     file = request.files["image"]
     output_format = request.form.get("format", "jpg").lower()
     enhance = request.form.get("enhance", "true").lower() == "true"
+    profile = resolve_profile(request.form.get("profile"))
+    timer = StageTimer()
+    check_budget(decoded_image_estimate(file), "This image")
     
     # Decode image with highest quality
-    np_img = np.frombuffer(file.read(), np.uint8)
-    img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
+    with timer.stage("decode"):
+        img = decode_image(file)
     
     if img is None:
         return jsonify({"error": "Invalid image"}), 400
     
     # Apply enhancement if requested
     if enhance:
-        img = adaptive_document_enhancement(img)
+        with timer.stage("enhance"):
+            img = adaptive_document_enhancement(img, profile, timer.timings)
     
     # Convert to PIL for high-quality output
     pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
     
     output = io.BytesIO()
     
-    if output_format in ["jpg", "jpeg"]:
-        # Maximum quality JPEG
-        pil_img.save(output, format="JPEG", quality=98, optimize=True, subsampling=0)
-        mimetype = "image/jpeg"
-        filename = "scanned.jpg"
-    elif output_format == "png":
-        # Lossless PNG
-        pil_img.save(output, format="PNG", optimize=True)
-        mimetype = "image/png"
-        filename = "scanned.png"
-    elif output_format == "pdf":
-        if pil_img.mode != "RGB":
-            pil_img = pil_img.convert("RGB")
-        # High resolution PDF
-        pil_img.save(output, format="PDF", resolution=300.0, quality=95)
-        mimetype = "application/pdf"
-        filename = "scanned.pdf"
-    else:
-        return jsonify({"error": "Unsupported format"}), 400
+    with timer.stage("write"):
+        if output_format in ["jpg", "jpeg"]:
+            # Maximum quality JPEG
+            pil_img.save(output, format="JPEG", quality=98, optimize=True, subsampling=0)
+            mimetype = "image/jpeg"
+            filename = "scanned.jpg"
+        elif output_format == "png":
+            # Lossless PNG
+            pil_img.save(output, format="PNG", optimize=True)
+            mimetype = "image/png"
+            filename = "scanned.png"
+        elif output_format == "pdf":
+            if pil_img.mode != "RGB":
+                pil_img = pil_img.convert("RGB")
+            # High resolution PDF
+            pil_img.save(output, format="PDF", resolution=300.0, quality=95)
+            mimetype = "application/pdf"
+            filename = "scanned.pdf"
+        else:
+            return jsonify({"error": "Unsupported format"}), 400
     
     output.seek(0)
-    return send_file(output, mimetype=mimetype, as_attachment=True, download_name=filename)
\ No newline at end of file
+    response = send_file(output, mimetype=mimetype, as_attachment=True, download_name=filename)
+    response.headers["X-Enhance-Profile"] = profile
+    response.headers["X-Stage-Timings"] = json.dumps(timer.timings)
+    return response
+
+
+def detect_corners_scaled(img, max_dim=1500):
+    """Detect document corners on a downscaled copy and map them back"""
+    h, w = img.shape[:2]
+    if max(h, w) > max_dim:
+        scale = max_dim / max(h, w)
+        img_resized = cv2.resize(img, (int(w * scale), int(h * scale)))
+        scale_back = max(h, w) / max_dim
+    else:
+        img_resized = img
+        scale_back = 1.0
+
+    doc_contour = detect_document_contour(img_resized)
+    if doc_contour is None:
+        return None
+    return doc_contour * scale_back
+
+
+def scan_page(file, corners=None, enhance=True, quality=90, profile=DEFAULT_PROFILE):
+    """Detect, warp and enhance one uploaded photo; returns (jpeg_bytes, width, height)"""
+    timer = StageTimer()
+    with timer.stage("decode"):
+        img = decode_image(file)
+    if img is None:
+        raise ValueError("Invalid image")
+
+    with timer.stage("warp"):
+        if corners is None:
+            corners = detect_corners_scaled(img)
+        if corners is not None:
+            img = four_point_transform(img, np.array(corners, dtype="float32"))
+
+    if enhance:
+        with timer.stage("enhance"):
+            img = adaptive_document_enhancement(img, profile, timer.timings)
+
+    with timer.stage("encode"):
+        ok, jpeg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+
+    h, w = img.shape[:2]
+    return jpeg.tobytes(), w, h
+
+
+def build_pdf_from_jpegs(pages, dpi=SCAN_PDF_DPI):
+    """Assemble (jpeg_bytes, width, height) pages into one PDF without re-encoding"""
+    doc = fitz.open()
+    for jpeg_bytes, w, h in pages:
+        # JPEG streams are embedded as-is (DCTDecode), no decode/re-encode
+        add_jpeg_page(doc, jpeg_bytes, w, h, dpi=dpi)
+    pdf_bytes = doc.tobytes(garbage=1, deflate=True)
+    doc.close()
+    return pdf_bytes
+
+
+def valid_corners(corners):
+    """True for a list of 4 [x, y] points with numeric coordinates"""
+    return (
+        isinstance(corners, (list, tuple)) and len(corners) == 4
+        and all(
+            isinstance(p, (list, tuple)) and len(p) == 2
+            and all(isinstance(v, numbers.Real) and not isinstance(v, bool) for v in p)
+            for p in corners
+        )
+    )
+
+
+@scan_doc_bp.route("/scan-batch", methods=["POST"])
+@upload_limits(max_mb=SCAN_BATCH_MAX_UPLOAD_MB, max_files=SCAN_BATCH_MAX_IMAGES)
+@admit("opencv")
+def scan_batch():
+    """Scan several photos (e.g. a multi-page contract) into a single PDF"""
+    files = request.files.getlist("images")
+    if not files:
+        return jsonify({"error": "No images uploaded"}), 400
+
+    if len(files) > SCAN_BATCH_MAX_IMAGES:
+        return jsonify({"error": f"At most {SCAN_BATCH_MAX_IMAGES} images per batch"}), 400
+
+    enhance = request.form.get("enhance", "true").lower() == "true"
+    profile = resolve_profile(request.form.get("profile"))
+
+    # Optional per-image corners: JSON list aligned with images, null = auto-detect
+    corners_list = [None] * len(files)
+    corners_raw = request.form.get("corners")
+    if corners_raw:
+        try:
+            parsed = json.loads(corners_raw)
+        except json.JSONDecodeError:
+            return jsonify({"error": "Invalid corners format"}), 400
+        if not isinstance(parsed, list):
+            return jsonify({"error": "Corners must be a list"}), 400
+        for i, c in enumerate(parsed[:len(files)]):
+            if c is not None and not valid_corners(c):
+                return jsonify({"error": f"Corners for image {i + 1} must be 4 [x, y] points"}), 400
+            corners_list[i] = c
+
+    observe_pages(len(files))
+    # Up to SCAN_WORKERS pages are decoded at once; the largest bound the working set
+    workers = min(SCAN_WORKERS, len(files))
+    estimates = sorted((decoded_image_estimate(f) for f in files), reverse=True)
+    check_budget(sum(estimates[:workers]), "These images")
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Each page runs in a copy of this context so stage metrics keep the route label
+            futures = [
+                pool.submit(contextvars.copy_context().run, scan_page, f, c, enhance, profile=profile)
+                for f, c in zip(files, corners_list)
+            ]
+            pages = [future.result() for future in futures]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with StageTimer().stage("write"):
+        pdf_bytes = build_pdf_from_jpegs(pages)
+    output = io.BytesIO(pdf_bytes)
+    output.seek(0)
+    return send_file(output, mimetype="application/pdf", as_attachment=True, download_name="scanned.pdf")
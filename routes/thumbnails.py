@@ -0,0 +1,145 @@
+from flask import Blueprint, request, send_file, jsonify, url_for
+import fitz  # PyMuPDF
+from services.metrics import StageTimer
+from services.pdf_cache import PdfCache
+from services.thumbnails import FORMATS, render_thumbnails, thumbnail_cache, thumbnail_key
+from services.uploads import open_pdf, upload_buffer
+
+thumbnails_bp = Blueprint("thumbnails", __name__, url_prefix="/thumbnails")
+
+# Uploaded PDFs are kept by content hash so later GETs can re-render evicted
+# thumbnails without another upload
+pdf_cache = PdfCache()
+
+THUMB_DEFAULT_WIDTH = 200
+THUMB_MIN_WIDTH = 32
+THUMB_MAX_WIDTH = 1200
+THUMB_MAX_PAGES = 500
+# Thumbnail URLs are content-addressed, so browsers may keep them for good
+THUMB_BROWSER_MAX_AGE = 365 * 24 * 3600
+
+
+def parse_pages(pages_str, total_pages):
+    """1-based page numbers from "1-3,7"; empty or "all" means every page.
+    Raises ValueError for malformed or reversed ranges."""
+    if pages_str in ("", "all"):
+        return list(range(1, total_pages + 1))
+    pages = set()
+    for part in pages_str.split(","):
+        bounds = part.strip().split("-")
+        if len(bounds) > 2:
+            raise ValueError(f"Invalid page range '{part}'")
+        start, end = int(bounds[0]), int(bounds[-1])
+        if start > end:
+            raise ValueError(f"Invalid page range '{part}'")
+        # Clamp before expanding: "1-30000000" must not build a huge range
+        pages.update(range(max(start, 1), min(end, total_pages) + 1))
+    return sorted(pages)
+
+
+def parse_options(values):
+    """(width, format, error) from request values; error is a message or None"""
+    try:
+        width = int(values.get("width", THUMB_DEFAULT_WIDTH))
+    except ValueError:
+        return None, None, "width must be a number of pixels"
+    if not THUMB_MIN_WIDTH <= width <= THUMB_MAX_WIDTH:
+        return None, None, f"width must be between {THUMB_MIN_WIDTH} and {THUMB_MAX_WIDTH}"
+    fmt = values.get("format", "webp").lower()
+    fmt = "jpeg" if fmt == "jpg" else fmt
+    if fmt not in FORMATS:
+        return None, None, f"Unsupported format '{fmt}'; use webp or jpeg"
+    return width, fmt, None
+
+
+@thumbnails_bp.route("", methods=["POST"])
+def create_thumbnails():
+    """
+    Render page thumbnails for an uploaded PDF (or one uploaded earlier, by docId)
+    and return their URLs; pages already in the cache are not rendered again
+    """
+    width, fmt, error = parse_options(request.form)
+    if error:
+        return jsonify({"error": error}), 400
+
+    timer = StageTimer()
+    doc_id = request.form.get("docId")
+    if "file" in request.files:
+        file = request.files["file"]
+        try:
+            doc = open_pdf(file)
+        except Exception as e:
+            return jsonify({"error": f"Could not open PDF: {e}"}), 400
+        with upload_buffer(file) as buf:
+            doc_id = pdf_cache.put(buf)
+    elif doc_id:
+        pdf_path = pdf_cache.path(doc_id)
+        if pdf_path is None:
+            return jsonify({"error": "Document not found; upload it again"}), 404
+        doc = fitz.open(pdf_path, filetype="pdf")
+    else:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    try:
+        if doc.needs_pass:
+            return jsonify({"error": "Encrypted PDFs are not supported"}), 400
+        try:
+            pages = parse_pages(request.form.get("pages", "").strip().lower(), len(doc))
+        except ValueError:
+            return jsonify({"error": "Invalid page range"}), 400
+        if not pages:
+            return jsonify({"error": "Invalid page range"}), 400
+        if len(pages) > THUMB_MAX_PAGES:
+            return jsonify({"error": f"At most {THUMB_MAX_PAGES} thumbnails per request"}), 400
+        page_count = len(doc)
+        sizes = {n: doc[n - 1].rect for n in pages}
+    finally:
+        doc.close()
+
+    with timer.stage("render"):
+        rendered = render_thumbnails(doc_id, pdf_cache.path(doc_id), pages, width, fmt)
+
+    return jsonify({
+        "docId": doc_id,
+        "pageCount": page_count,
+        "format": fmt,
+        "rendered": rendered,
+        "cached": len(pages) - rendered,
+        "thumbnails": [
+            {
+                "page": n,
+                "width": width,
+                "height": round(width * sizes[n].height / sizes[n].width),
+                "url": url_for("thumbnails.get_thumbnail", doc_id=doc_id, page=n, width=width, format=fmt),
+            }
+            for n in pages
+        ],
+    })
+
+
+@thumbnails_bp.route("/<doc_id>/<int:page>", methods=["GET"])
+def get_thumbnail(doc_id, page):
+    """One page thumbnail; rendered on demand while the PDF is still cached"""
+    width, fmt, error = parse_options(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    key = thumbnail_key(doc_id, page, width, fmt)
+    path = thumbnail_cache.path(key)
+    if path is None:
+        pdf_path = pdf_cache.path(doc_id)
+        if pdf_path is None:
+            return jsonify({"error": "Document not found; upload it again"}), 404
+        with fitz.open(pdf_path, filetype="pdf") as doc:
+            page_count = len(doc)
+        if not 1 <= page <= page_count:
+            return jsonify({"error": "Invalid page number"}), 400
+        with StageTimer().stage("render"):
+            render_thumbnails(doc_id, pdf_path, [page], width, fmt)
+        path = thumbnail_cache.path(key)
+
+    # The key is content-addressed; the file's mtime changes with every cache hit
+    response = send_file(path, mimetype=FORMATS[fmt][1], etag=key, max_age=THUMB_BROWSER_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
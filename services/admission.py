@@ -0,0 +1,152 @@
+import fcntl
+import math
+import os
+import tempfile
+import threading
+import time
+from functools import wraps
+
+from flask import request
+from prometheus_client import Gauge
+
+# Admission control for the heavy resource classes. Each class has a fixed
+# number of slots shared by every worker on the host (one flock'd file per
+# slot, so a killed worker's slots are released by the kernel) and a bounded
+# wait queue. A request that finds the queue full, or waits longer than
+# ADMISSION_QUEUE_TIMEOUT, is turned away with 503 + Retry-After instead of
+# slowing everyone down.
+
+CPU_COUNT = os.cpu_count() or 1
+ADMISSION_DIR = os.environ.get("ADMISSION_DIR") or os.path.join(tempfile.gettempdir(), "scanner-admission")
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 30))
+ADMISSION_POLL_INTERVAL = 0.02
+
+# class: (concurrent requests, queued requests); ADMISSION_<CLASS>_LIMIT and
+# ADMISSION_<CLASS>_QUEUE override
+DEFAULT_LIMITS = {
+    "tesseract": (max(1, CPU_COUNT // 2), CPU_COUNT),
+    "ghostscript": (max(1, CPU_COUNT // 2), CPU_COUNT),
+    "libreoffice": (2, 8),
+    "opencv": (CPU_COUNT, CPU_COUNT * 2),
+}
+
+ACTIVE = Gauge(
+    "scanner_admission_active", "Requests holding a slot", ["resource"],
+    multiprocess_mode="livesum"
+)
+QUEUED = Gauge(
+    "scanner_admission_queue_depth", "Requests waiting for a slot", ["resource"],
+    multiprocess_mode="livesum"
+)
+
+
+class AdmissionRejected(Exception):
+    """No slot became available for a resource class (HTTP 503)"""
+
+    def __init__(self, resource, retry_after):
+        super().__init__(f"Server busy: too many {resource} jobs in progress, retry in {retry_after}s")
+        self.resource = resource
+        self.retry_after = retry_after
+
+
+class _Slots:
+    """Fixed set of flock'd files; holding a lock on one means holding the slot"""
+
+    def __init__(self, root, prefix, count):
+        self.paths = [os.path.join(root, f"{prefix}.{i}.lock") for i in range(count)]
+
+    def try_acquire(self):
+        for path in self.paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    @staticmethod
+    def release(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+class ResourceClass:
+    def __init__(self, name, limit, queue_size, root=ADMISSION_DIR):
+        os.makedirs(root, exist_ok=True)
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.slots = _Slots(root, name, self.limit)
+        self.queue = _Slots(root, f"{name}.queue", self.queue_size)
+        # Recent slot hold time in this worker, for the Retry-After hint
+        self.avg_hold = 5.0
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        waves = (self.queue_size + self.limit) / self.limit
+        return max(1, math.ceil(self.avg_hold * waves))
+
+    def acquire(self, timeout=ADMISSION_QUEUE_TIMEOUT):
+        fd = self.slots.try_acquire()
+        if fd is not None:
+            return fd
+
+        # Take a queue place first; a full queue is rejected immediately
+        ticket = self.queue.try_acquire()
+        if ticket is None:
+            raise AdmissionRejected(self.name, self.retry_after())
+        QUEUED.labels(self.name).inc()
+        try:
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                time.sleep(ADMISSION_POLL_INTERVAL)
+                fd = self.slots.try_acquire()
+                if fd is not None:
+                    return fd
+            raise AdmissionRejected(self.name, self.retry_after())
+        finally:
+            QUEUED.labels(self.name).dec()
+            _Slots.release(ticket)
+
+    def release(self, fd, held):
+        _Slots.release(fd)
+        with self._lock:
+            self.avg_hold = 0.8 * self.avg_hold + 0.2 * held
+
+    def run(self, fn, *args, **kwargs):
+        fd = self.acquire()
+        ACTIVE.labels(self.name).inc()
+        start = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            ACTIVE.labels(self.name).dec()
+            self.release(fd, time.monotonic() - start)
+
+
+def _configured(name):
+    limit, queue_size = DEFAULT_LIMITS[name]
+    prefix = f"ADMISSION_{name.upper()}"
+    return ResourceClass(
+        name,
+        int(os.environ.get(f"{prefix}_LIMIT", limit)),
+        int(os.environ.get(f"{prefix}_QUEUE", queue_size)),
+    )
+
+
+resource_classes = {name: _configured(name) for name in DEFAULT_LIMITS}
+
+
+def admit(resource):
+    """Run the view only once a slot of the resource class is free"""
+    resource_class = resource_classes[resource]
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == "OPTIONS":
+                return view(*args, **kwargs)
+            return resource_class.run(view, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,94 @@
+import fcntl
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from services.deadline import check
+
+# Host-wide CPU core budget shared by all in-flight requests of every worker.
+# Heavy subprocess work (ocrmypdf, tesseract) leases cores from here so that
+# concurrent uploads split the machine instead of oversubscribing it. Each
+# core is a flock'd file, as in services/admission.py, so a killed worker's
+# cores are released by the kernel.
+
+CPU_BUDGET = int(os.environ.get("CPU_BUDGET", os.cpu_count() or 2))
+CPU_BUDGET_DIR = os.environ.get("CPU_BUDGET_DIR") or os.path.join(tempfile.gettempdir(), "scanner-cpu-budget")
+CPU_BUDGET_POLL_INTERVAL = 0.05
+
+
+class CpuBudget:
+    """Counting lease of CPU cores; callers get between min_cores and max_cores"""
+
+    def __init__(self, total, root=CPU_BUDGET_DIR):
+        os.makedirs(root, exist_ok=True)
+        self.total = max(1, total)
+        self.paths = [os.path.join(root, f"core.{i}.lock") for i in range(self.total)]
+        # Cores held by this worker process
+        self.held = 0
+        self._lock = threading.Lock()
+
+    def _try_lock(self, max_cores):
+        fds = []
+        for path in self.paths:
+            if len(fds) == max_cores:
+                break
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fds.append(fd)
+            except BlockingIOError:
+                os.close(fd)
+        return fds
+
+    def _unlock(self, fds):
+        for fd in fds:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def acquire(self, max_cores, min_cores=1):
+        """Lock between min_cores and max_cores cores; returns their file descriptors.
+        Waits, within the request deadline, while fewer than min_cores are free."""
+        max_cores = max(1, min(max_cores, self.total))
+        min_cores = max(1, min(min_cores, max_cores))
+        while True:
+            fds = self._try_lock(max_cores)
+            if len(fds) >= min_cores:
+                with self._lock:
+                    self.held += len(fds)
+                return fds
+            self._unlock(fds)
+            check("cpu budget")
+            time.sleep(CPU_BUDGET_POLL_INTERVAL)
+
+    def release(self, fds):
+        self._unlock(fds)
+        with self._lock:
+            self.held -= len(fds)
+
+    @contextmanager
+    def lease(self, max_cores, min_cores=1):
+        fds = self.acquire(max_cores, min_cores)
+        try:
+            yield len(fds)
+        finally:
+            self.release(fds)
+
+    def in_use(self):
+        """Cores held by this worker process"""
+        with self._lock:
+            return self.held
+
+
+cpu_budget = CpuBudget(CPU_BUDGET)
+
+
+def split_cores(weights, total=None):
+    """Split a core count across jobs proportionally to weights (e.g. page counts)"""
+    total = total or cpu_budget.total
+    weight_sum = sum(weights) or 1
+    return [
+        max(1, min(max(1, w), round(total * w / weight_sum)))
+        for w in weights
+    ]
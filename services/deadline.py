@@ -0,0 +1,166 @@
+import contextvars
+import os
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+# Per-request deadlines. Every request gets a time budget (REQUEST_DEADLINE
+# seconds, by default the serving pool's timeout) kept in a context variable,
+# so work handed to pools with contextvars.copy_context().run inherits it.
+# External tools started through run_subprocess() are killed, together with their
+# children, when the budget runs out, and DeadlineExceeded becomes a
+# structured 504. Work on a DeadlinePool is cancelled the same way, by killing
+# the pool's worker processes. Partial output lives in request scratch space
+# and is removed with it.
+
+REQUEST_DEADLINE = float(os.environ.get("REQUEST_DEADLINE", 0)) or None
+
+# (absolute time.monotonic() deadline, budget in seconds)
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of its time budget (HTTP 504)"""
+
+    def __init__(self, step, budget=None):
+        budget = budget if budget is not None else budget_seconds()
+        limit = f"the {budget:g}s request deadline" if budget else "its deadline"
+        super().__init__(f"{step} did not finish within {limit}")
+        self.step = step
+        self.budget = budget
+
+
+def start(seconds):
+    """Give the current context a budget of seconds from now (None clears it)"""
+    _deadline.set((time.monotonic() + seconds, seconds) if seconds else None)
+
+
+def budget_seconds():
+    current = _deadline.get()
+    return current[1] if current else None
+
+
+def remaining():
+    """Seconds left, or None when there is no deadline"""
+    current = _deadline.get()
+    if current is None:
+        return None
+    return max(0.0, current[0] - time.monotonic())
+
+
+def timeout(step, cap=None):
+    """Timeout for the next blocking step: what is left of the budget, at most cap.
+    Raises DeadlineExceeded when nothing is left; None when unbounded."""
+    left = remaining()
+    if left is None:
+        return cap
+    if left <= 0:
+        raise DeadlineExceeded(step)
+    return min(left, cap) if cap else left
+
+
+def check(step):
+    """Raise DeadlineExceeded when the request's budget is spent"""
+    if remaining() == 0:
+        raise DeadlineExceeded(step)
+
+
+def _kill_group(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run_subprocess(cmd, step=None, check=False, cap=None, **kwargs):
+    """subprocess.run bounded by the request deadline.
+
+    The child gets its own process group, so helpers it starts itself
+    (soffice.bin, gs and tesseract under ocrmypdf) are killed with it.
+    """
+    step = step or os.path.basename(cmd[0])
+    limit = timeout(step, cap)
+    if kwargs.pop("capture_output", False):
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    with subprocess.Popen(cmd, start_new_session=True, **kwargs) as proc:
+        try:
+            stdout, stderr = proc.communicate(timeout=limit)
+        except subprocess.TimeoutExpired:
+            _kill_group(proc)
+            proc.communicate()
+            if remaining() == 0:
+                raise DeadlineExceeded(step)
+            raise
+        except BaseException:
+            _kill_group(proc)
+            raise
+    if check and proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+def kill_pool(executor):
+    """Stop a ProcessPoolExecutor now, killing jobs that are still running"""
+    for proc in list(executor._processes.values()):
+        proc.kill()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class DeadlinePool:
+    """ProcessPoolExecutor whose batches are bounded by the request deadline.
+
+    A batch that overruns kills the workers, the only way to stop a running
+    job, and the next batch starts a fresh pool. Batches of other requests
+    that lose their workers this way are retried once.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _reset(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        kill_pool(executor)
+
+    def map(self, fn, jobs, step):
+        """[fn(job) for job in jobs] on the pool; raises DeadlineExceeded(step) on overrun"""
+        jobs = list(jobs)
+        for attempt in range(2):
+            executor = self._get_executor()
+            futures = [executor.submit(fn, job) for job in jobs]
+            try:
+                return [future.result(timeout=timeout(step)) for future in futures]
+            except (FuturesTimeout, DeadlineExceeded):
+                self._reset(executor)
+                raise DeadlineExceeded(step)
+            except BrokenProcessPool:
+                self._reset(executor)
+                if attempt:
+                    raise RuntimeError(f"{step} worker process died")
+
+
+def _teardown_request(exc):
+    start(None)
+
+
+def init_deadlines(app, default=None):
+    """Start every request of an app with a budget of REQUEST_DEADLINE (or default) seconds"""
+    seconds = REQUEST_DEADLINE or default
+
+    def _before_request():
+        start(seconds)
+
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+
+from services.metrics import StageTimer
+
+# Enhancement profiles shared by /scan and /ocr preprocessing
+#   quality  - full resolution fastNlMeans denoise (original behaviour)
+#   balanced - denoise a downscaled copy, upsample the luminance correction
+#   fast     - CLAHE + unsharp mask only, no denoise
+PROFILES = ("quality", "balanced", "fast")
+DEFAULT_PROFILE = "quality"
+
+# Longest side used for the reduced-resolution denoise in "balanced"
+BALANCED_MAX_DIM = 1000
+
+
+def resolve_profile(name):
+    """Normalise a user supplied profile name, falling back to the default"""
+    name = (name or DEFAULT_PROFILE).lower()
+    return name if name in PROFILES else DEFAULT_PROFILE
+
+
+def apply_clahe(img, clip_limit=2.0):
+    """CLAHE on luminance (LAB L channel for colour, directly for grayscale)"""
+    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(8, 8))
+    if len(img.shape) == 2:
+        return clahe.apply(img)
+
+    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    l = clahe.apply(l)
+    return cv2.cvtColor(cv2.merge((l, a, b)), cv2.COLOR_LAB2BGR)
+
+
+def unsharp_mask(img, sigma=2.0, amount=0.5):
+    """Gentle sharpening using unsharp mask"""
+    gaussian = cv2.GaussianBlur(img, (0, 0), sigma)
+    return cv2.addWeighted(img, 1 + amount, gaussian, -amount, 0)
+
+
+def _nlmeans(img, strength):
+    if len(img.shape) == 3:
+        return cv2.fastNlMeansDenoisingColored(img, None, strength, strength, 7, 21)
+    return cv2.fastNlMeansDenoising(img, None, strength, 7, 21)
+
+
+def _denoise_reduced(img, strength):
+    """Denoise a downscaled copy and apply the luminance correction at full size"""
+    h, w = img.shape[:2]
+    scale = BALANCED_MAX_DIM / max(h, w)
+    if scale >= 1:
+        return _nlmeans(img, strength)
+
+    small = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    denoised_small = _nlmeans(small, strength)
+
+    if len(img.shape) == 3:
+        small_l = cv2.cvtColor(small, cv2.COLOR_BGR2LAB)[:, :, 0]
+        denoised_l = cv2.cvtColor(denoised_small, cv2.COLOR_BGR2LAB)[:, :, 0]
+    else:
+        small_l, denoised_l = small, denoised_small
+
+    # Correction is smooth by construction, so a linear upsample is enough
+    correction = denoised_l.astype(np.int16) - small_l.astype(np.int16)
+    correction = cv2.resize(correction.astype(np.float32), (w, h), interpolation=cv2.INTER_LINEAR)
+
+    if len(img.shape) == 3:
+        lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+        l = np.clip(lab[:, :, 0].astype(np.float32) + correction, 0, 255).astype(np.uint8)
+        lab[:, :, 0] = l
+        return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+    return np.clip(img.astype(np.float32) + correction, 0, 255).astype(np.uint8)
+
+
+def denoise(img, strength=10, profile=DEFAULT_PROFILE, timings=None):
+    """Profile-aware denoise; "fast" skips the step entirely"""
+    profile = resolve_profile(profile)
+    if profile == "fast":
+        return img
+
+    with StageTimer(timings).stage("denoise"):
+        if profile == "balanced":
+            return _denoise_reduced(img, strength)
+        return _nlmeans(img, strength)
+
+
+def enhance_image(img, profile=DEFAULT_PROFILE, denoise_strength=10, timings=None):
+    """CLAHE + unsharp mask + profile-dependent denoise"""
+    timer = StageTimer(timings)
+
+    with timer.stage("clahe"):
+        img = apply_clahe(img)
+
+    with timer.stage("sharpen"):
+        img = unsharp_mask(img)
+
+    return denoise(img, denoise_strength, profile, timer.timings)
@@ -0,0 +1,262 @@
+import ctypes
+import ctypes.util
+import os
+import platform
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from services.deadline import DeadlineExceeded, kill_pool, run_subprocess, timeout
+from services.metrics import track_subprocess
+from services.scratch import scratch_path
+
+# Ghostscript pdfwrite compression profiles, a target-size search and a pool
+# of long-lived worker processes that drive libgs through the gsapi interface
+# instead of spawning a fresh `gs` for every call.
+
+PROFILES = {
+    # Original /compress-pdf settings
+    "default": {"dpi": 100, "jpegq": 60, "mono_dpi": 300},
+    "screen": {"dpi": 72, "jpegq": 40, "mono_dpi": 150},
+    "ebook": {"dpi": 150, "jpegq": 70, "mono_dpi": 300},
+    "printer": {"dpi": 300, "jpegq": 85, "mono_dpi": 600},
+    # No downsampling, Flate only: removes structural bloat without touching pixels
+    "lossless": {"dpi": None, "jpegq": None, "mono_dpi": None},
+}
+DEFAULT_PROFILE = "default"
+
+# Quality ladder for target-size mode, best quality first
+TARGET_LADDER = [
+    {"dpi": 300, "jpegq": 85, "mono_dpi": 600},
+    {"dpi": 200, "jpegq": 80, "mono_dpi": 300},
+    {"dpi": 150, "jpegq": 70, "mono_dpi": 300},
+    {"dpi": 120, "jpegq": 60, "mono_dpi": 300},
+    {"dpi": 100, "jpegq": 50, "mono_dpi": 200},
+    {"dpi": 72, "jpegq": 40, "mono_dpi": 150},
+    {"dpi": 50, "jpegq": 30, "mono_dpi": 100},
+]
+
+GS_POOL_SIZE = int(os.environ.get("GS_POOL_SIZE", min(4, os.cpu_count() or 1)))
+GS_USE_API = os.environ.get("GS_USE_API", "1") == "1"
+
+# gsapi return codes that mean success
+_GS_OK = (0, -101)  # 0, gs_error_Quit
+_GS_ARG_ENCODING_UTF8 = 1
+
+
+def find_ghostscript():
+    """Path to the Ghostscript executable, or None"""
+    if platform.system() == "Windows":
+        # Windows: point directly to gswin64c.exe
+        path = r"C:\Program Files\gs\gs10.06.0\bin\gswin64c.exe"
+        return path if os.path.exists(path) else None
+    # Linux/Mac: use gs in PATH
+    return shutil.which("gs")
+
+
+def find_libgs():
+    """Path/name of the Ghostscript shared library, or None"""
+    for name in ("gs", "gsdll64", "gsdll32"):
+        found = ctypes.util.find_library(name)
+        if found:
+            return found
+    for name in ("libgs.so.10", "libgs.so.9"):
+        try:
+            ctypes.CDLL(name)
+            return name
+        except OSError:
+            continue
+    return None
+
+
+def build_pdfwrite_args(settings, input_path, output_path):
+    """pdfwrite arguments (without the executable) for one settings dict"""
+    args = [
+        "-sDEVICE=pdfwrite",
+        "-dCompatibilityLevel=1.4",
+        "-dDetectDuplicateImages=true",
+        "-dCompressFonts=true",
+        "-dSubsetFonts=true",
+    ]
+
+    if settings["dpi"] is None:
+        args += [
+            "-dDownsampleColorImages=false",
+            "-dDownsampleGrayImages=false",
+            "-dDownsampleMonoImages=false",
+            "-dPassThroughJPEGImages=true",
+            "-dAutoFilterColorImages=false",
+            "-dAutoFilterGrayImages=false",
+            "-dColorImageFilter=/FlateEncode",
+            "-dGrayImageFilter=/FlateEncode",
+        ]
+    else:
+        args += [
+            "-dDownsampleColorImages=true",
+            "-dDownsampleGrayImages=true",
+            "-dDownsampleMonoImages=true",
+            f"-dColorImageResolution={settings['dpi']}",
+            f"-dGrayImageResolution={settings['dpi']}",
+            f"-dMonoImageResolution={settings['mono_dpi']}",
+            "-dColorImageDownsampleType=/Bicubic",
+            "-dGrayImageDownsampleType=/Bicubic",
+            "-dMonoImageDownsampleType=/Subsample",
+            f"-dJPEGQ={settings['jpegq']}",
+        ]
+
+    args += [
+        "-dNOPAUSE",
+        "-dQUIET",
+        "-dBATCH",
+        f"-sOutputFile={output_path}",
+        input_path,
+    ]
+    return args
+
+
+# ------------------ gsapi worker processes ------------------
+_libgs = None
+
+
+def _init_worker(lib_name):
+    """Load libgs once per worker process"""
+    global _libgs
+    _libgs = ctypes.CDLL(lib_name)
+
+
+def _run_gsapi(args):
+    instance = ctypes.c_void_p()
+    rc = _libgs.gsapi_new_instance(ctypes.byref(instance), None)
+    if rc < 0:
+        return rc
+    try:
+        _libgs.gsapi_set_arg_encoding(instance, _GS_ARG_ENCODING_UTF8)
+        argv = ["gs"] + args
+        c_argv = (ctypes.c_char_p * len(argv))(*[a.encode("utf-8") for a in argv])
+        rc = _libgs.gsapi_init_with_args(instance, len(argv), c_argv)
+        exit_rc = _libgs.gsapi_exit(instance)
+        return rc if rc not in _GS_OK else exit_rc
+    finally:
+        _libgs.gsapi_delete_instance(instance)
+
+
+class GhostscriptPool:
+    """Long-lived processes with libgs loaded; falls back to the gs executable"""
+
+    def __init__(self, size=GS_POOL_SIZE):
+        self.size = size
+        self._resolved = False
+        self.lib_name = None
+        self.gs_path = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        # Located on first use: find_library may shell out (ldconfig)
+        if not self._resolved:
+            self.lib_name = find_libgs() if GS_USE_API else None
+            self.gs_path = find_ghostscript()
+            self._resolved = True
+
+    @property
+    def available(self):
+        self._resolve()
+        return bool(self.lib_name or self.gs_path)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    initializer=_init_worker,
+                    initargs=(self.lib_name,)
+                )
+            return self._executor
+
+    def _reset(self, executor):
+        """Kill a pool whose job overran its deadline; the next run starts a fresh one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        kill_pool(executor)
+
+    def _run_api(self, args):
+        for attempt in range(2):
+            executor = self._get_executor()
+            future = executor.submit(_run_gsapi, args)
+            try:
+                return future.result(timeout=timeout("gs"))
+            except FuturesTimeout:
+                self._reset(executor)
+                raise DeadlineExceeded("gs")
+            except BrokenProcessPool:
+                # Another request's overrun killed the pool; retry once on a fresh one
+                self._reset(executor)
+                if attempt:
+                    raise RuntimeError("Ghostscript worker process died")
+
+    def run(self, args):
+        """Run one Ghostscript job within the request deadline; raises RuntimeError on failure"""
+        self._resolve()
+        if self.lib_name:
+            with track_subprocess("gs"):
+                rc = self._run_api(args)
+                if rc not in _GS_OK:
+                    raise RuntimeError(f"Ghostscript failed with code {rc}")
+            return
+
+        if not self.gs_path:
+            raise RuntimeError("Ghostscript not found. Please install Ghostscript.")
+        with track_subprocess("gs"):
+            run_subprocess([self.gs_path] + args, step="gs", check=True)
+
+
+gs_pool = GhostscriptPool()
+
+
+def compress_with_profile(input_path, output_path, profile=DEFAULT_PROFILE):
+    """Compress with a named profile; returns the output size in bytes"""
+    settings = PROFILES.get(profile, PROFILES[DEFAULT_PROFILE])
+    gs_pool.run(build_pdfwrite_args(settings, input_path, output_path))
+    return os.path.getsize(output_path)
+
+
+def compress_to_target(input_path, output_path, target_size):
+    """
+    Binary search the quality ladder for the best settings whose output fits
+    target_size bytes. Falls back to the smallest result if none fits.
+    Returns (size, settings, met_target).
+    """
+    # Attempts live in the request scratch directory, so they are counted
+    # and cleaned up (or reaped) with the request
+    attempts = {}
+    try:
+        def attempt(i):
+            if i not in attempts:
+                path = scratch_path(f"gs_target_{i}.pdf")
+                gs_pool.run(build_pdfwrite_args(TARGET_LADDER[i], input_path, path))
+                attempts[i] = (os.path.getsize(path), path)
+            return attempts[i][0]
+
+        lo, hi = 0, len(TARGET_LADDER) - 1
+        best = None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if attempt(mid) <= target_size:
+                best = mid
+                hi = mid - 1
+            else:
+                lo = mid + 1
+
+        met = best is not None
+        if not met:
+            best = min(attempts, key=lambda i: attempts[i][0])
+
+        shutil.move(attempts[best][1], output_path)
+        return attempts[best][0], TARGET_LADDER[best], met
+    finally:
+        # Discarded attempts need not wait for the request to end
+        for _, path in attempts.values():
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,103 @@
+from io import BytesIO
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageOps
+
+# Image -> PDF page engine shared by /image-to-pdf and /scan-batch.
+# Images are handled one at a time: baseline JPEGs are embedded as-is
+# (DCTDecode, no decode or generation loss), everything else is decoded,
+# downscaled on the fly and embedded as a fresh JPEG.
+
+PAGE_SIZES = {
+    "a4": fitz.paper_size("a4"),
+    "letter": fitz.paper_size("letter"),
+    "legal": fitz.paper_size("legal"),
+}
+FIT_MODES = ("contain", "stretch")
+
+# Largest side kept when an image has to be decoded anyway
+MAX_DECODE_DIM = 4000
+REENCODE_QUALITY = 90
+
+# EXIF orientation -> counter-clockwise rotation for insert_image.
+# Mirrored orientations (2, 4, 5, 7) are not expressible as a rotation.
+EXIF_ROTATION = {1: 0, 3: 180, 6: 270, 8: 90}
+
+
+def _exif_orientation(img):
+    try:
+        return img.getexif().get(0x0112, 1)
+    except Exception:
+        return 1
+
+
+def _page_rect(page_size, orientation, img_w, img_h, dpi):
+    if page_size == "auto":
+        return fitz.Rect(0, 0, img_w * 72.0 / dpi, img_h * 72.0 / dpi)
+
+    w, h = PAGE_SIZES[page_size]
+    landscape = orientation == "landscape" or (orientation == "auto" and img_w > img_h)
+    if landscape:
+        w, h = h, w
+    return fitz.Rect(0, 0, w, h)
+
+
+def _image_rect(page_rect, img_w, img_h, fit, margin):
+    area = page_rect + (margin, margin, -margin, -margin)
+    if fit == "stretch":
+        return area
+    scale = min(area.width / img_w, area.height / img_h)
+    w, h = img_w * scale, img_h * scale
+    x0 = area.x0 + (area.width - w) / 2
+    y0 = area.y0 + (area.height - h) / 2
+    return fitz.Rect(x0, y0, x0 + w, y0 + h)
+
+
+def add_jpeg_page(doc, jpeg_bytes, width, height, dpi=72, page_size="auto",
+                  orientation="auto", fit="contain", margin=0, rotate=0):
+    """Add one page holding an already-encoded JPEG (embedded without re-encoding)"""
+    # Displayed size after rotation
+    if rotate in (90, 270):
+        width, height = height, width
+    page_rect = _page_rect(page_size, orientation, width, height, dpi)
+    page = doc.new_page(width=page_rect.width, height=page_rect.height)
+    rect = _image_rect(page.rect, width, height, fit, margin if page_size != "auto" else 0)
+    page.insert_image(rect, stream=jpeg_bytes, rotate=rotate, keep_proportion=(fit == "contain"))
+    return page
+
+
+def _reencode(data, max_dim):
+    img = Image.open(BytesIO(data))
+    if img.format == "JPEG" and max(img.size) > max_dim:
+        img.draft("RGB", (max_dim, max_dim))
+    img = ImageOps.exif_transpose(img)
+
+    if img.mode in ("RGBA", "LA", "P"):
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    if max(img.size) > max_dim:
+        img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+
+    out = BytesIO()
+    img.save(out, format="JPEG", quality=REENCODE_QUALITY, optimize=True)
+    return out.getvalue(), img.width, img.height
+
+
+def add_image_page(doc, data, dpi=72, page_size="auto", orientation="auto",
+                   fit="contain", margin=0, max_dim=MAX_DECODE_DIM):
+    """Add one uploaded image as a page; returns "embedded" or "reencoded" """
+    img = Image.open(BytesIO(data))  # header only, pixels are not decoded
+    orientation_tag = _exif_orientation(img)
+
+    if img.format == "JPEG" and img.mode in ("RGB", "L") and orientation_tag in EXIF_ROTATION:
+        add_jpeg_page(doc, data, img.width, img.height, dpi, page_size,
+                      orientation, fit, margin, rotate=EXIF_ROTATION[orientation_tag])
+        return "embedded"
+
+    jpeg_bytes, width, height = _reencode(data, max_dim)
+    add_jpeg_page(doc, jpeg_bytes, width, height, dpi, page_size, orientation, fit, margin)
+    return "reencoded"
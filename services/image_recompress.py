@@ -0,0 +1,140 @@
+import io
+import os
+import zlib
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+from services.deadline import DeadlinePool
+from services.pdf_optimizer import image_dpi_map
+
+# Per-image recompression for image-heavy (scanned) PDFs. Image XObjects are
+# extracted with PyMuPDF, re-encoded on a process pool with a per-image
+# decision (JPEG quality, grayscale or bilevel), and written back in place
+# into the same xref so page content and soft masks stay untouched.
+
+RECOMPRESS_WORKERS = int(os.environ.get("RECOMPRESS_WORKERS", os.cpu_count() or 2))
+
+# RGB images whose channels differ less than this on average are stored as gray
+GRAY_CHANNEL_TOLERANCE = 6
+# Gray images with fewer mid-tone pixels than this fraction become bilevel
+BILEVEL_MIDTONE_FRACTION = 0.03
+# Only large images (scanned pages) are considered for bilevel conversion
+BILEVEL_MIN_PIXELS = 1000 * 1000
+
+_pool = DeadlinePool(RECOMPRESS_WORKERS)
+
+
+def _is_grayscale(arr):
+    if arr.ndim == 2:
+        return True
+    # Sample every 4th pixel; plenty for a colour decision
+    sample = arr[::4, ::4].astype(np.int16)
+    diff = np.abs(sample[:, :, 0] - sample[:, :, 1]) + np.abs(sample[:, :, 1] - sample[:, :, 2])
+    return float(diff.mean()) < GRAY_CHANNEL_TOLERANCE
+
+
+def _is_bilevel(gray):
+    if gray.size < BILEVEL_MIN_PIXELS:
+        return False
+    sample = gray[::4, ::4]
+    midtones = np.count_nonzero((sample > 64) & (sample < 192))
+    return midtones / sample.size < BILEVEL_MIDTONE_FRACTION
+
+
+def recompress_image(job):
+    """
+    Worker: choose an encoding for one image and return
+    (xref, data, width, height, colorspace, bpc, filter, kind) or None to keep it.
+    """
+    xref, img_bytes, original_size, scale, quality = job
+    try:
+        img = Image.open(io.BytesIO(img_bytes))
+        if img.mode in ("CMYK", "1") or img.mode.startswith("I") or img.mode == "F":
+            return None
+        if img.format == "JPEG" and scale < 1:
+            img.draft("RGB", (int(img.width * scale), int(img.height * scale)))
+        img = img.convert("RGB") if img.mode not in ("L", "RGB") else img
+
+        if scale < 1:
+            new_size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+            img = img.resize(new_size, Image.LANCZOS)
+
+        arr = np.asarray(img)
+        if img.mode == "RGB" and _is_grayscale(arr):
+            img = img.convert("L")
+            arr = np.asarray(img)
+
+        if img.mode == "L" and _is_bilevel(arr):
+            # Scanned text page: 1 bit per pixel, Flate compressed
+            bilevel = img.point(lambda v: 255 if v >= 128 else 0).convert("1")
+            data = zlib.compress(bilevel.tobytes(), 9)
+            result = (xref, data, img.width, img.height, "/DeviceGray", 1, "/FlateDecode", "bilevel")
+        else:
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=quality, optimize=True)
+            colorspace = "/DeviceGray" if img.mode == "L" else "/DeviceRGB"
+            kind = "gray" if img.mode == "L" else "jpeg"
+            result = (xref, out.getvalue(), img.width, img.height, colorspace, 8, "/DCTDecode", kind)
+
+        return result if len(result[1]) < original_size else None
+    except Exception as e:
+        print(f"⚠ Image {xref} recompression skipped: {e}")
+        return None
+
+
+def recompress_images(input_path, output_path, max_dpi=150, jpeg_quality=60):
+    """Recompress every image XObject of a PDF in parallel; returns a stats dict"""
+    stats = {"images": 0, "jpeg": 0, "gray": 0, "bilevel": 0, "skipped": 0}
+    dpis = image_dpi_map(input_path) if max_dpi else {}
+
+    doc = fitz.open(input_path)
+    try:
+        jobs = []
+        seen = set()
+        smasks = set()
+        for page in doc:
+            for info in page.get_images(full=True):
+                xref, smask = info[0], info[1]
+                if smask:
+                    smasks.add(smask)
+                if xref in seen:
+                    continue
+                seen.add(xref)
+
+        for xref in seen - smasks:
+            if doc.xref_get_key(xref, "ImageMask")[1] == "true":
+                continue
+            raw_len = len(doc.xref_stream_raw(xref) or b"")
+            extracted = doc.extract_image(xref)
+            if not extracted or not raw_len:
+                continue
+            dpi = dpis.get(xref, 0)
+            scale = min(1.0, max_dpi / dpi) if max_dpi and dpi else 1.0
+            jobs.append((xref, extracted["image"], raw_len, scale, jpeg_quality))
+
+        stats["images"] = len(jobs)
+        results = _pool.map(recompress_image, jobs, "recompress") if jobs else []
+
+        for result in results:
+            if result is None:
+                stats["skipped"] += 1
+                continue
+            xref, data, width, height, colorspace, bpc, filter_name, kind = result
+            # Replace the stream in place so every reference (and /SMask) stays valid
+            doc.update_stream(xref, data, compress=False)
+            doc.xref_set_key(xref, "Filter", filter_name)
+            doc.xref_set_key(xref, "Width", str(width))
+            doc.xref_set_key(xref, "Height", str(height))
+            doc.xref_set_key(xref, "ColorSpace", colorspace)
+            doc.xref_set_key(xref, "BitsPerComponent", str(bpc))
+            doc.xref_set_key(xref, "DecodeParms", "null")
+            doc.xref_set_key(xref, "Decode", "null")
+            stats[kind] += 1
+
+        doc.save(output_path, garbage=3, deflate=True)
+    finally:
+        doc.close()
+
+    stats["size"] = os.path.getsize(output_path)
+    return stats
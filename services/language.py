@@ -0,0 +1,151 @@
+import hashlib
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+import pytesseract
+from PIL import Image
+
+from services.deadline import check, timeout
+
+# Shared script/language detection for /ocr, /ocr-pdf and /pdfa-ocr.
+# OSD runs once on a downsampled grayscale image and is cached by image hash.
+
+DEFAULT_LANGUAGE = "eng"
+
+# Models for Latin-script pages. OSD cannot tell these languages apart, but
+# every extra model runs on every pass, so only English is loaded by default.
+# LATIN_LANGUAGES="eng+fra+deu+spa+ita+por" enables the other installed packs
+# for lang=auto; clients can also ask for them with an explicit lang=.
+LATIN_LANGUAGES = os.environ.get("LATIN_LANGUAGES", DEFAULT_LANGUAGE).split("+")
+
+# Tesseract OSD script name -> language models to load
+SCRIPT_LANGUAGES = {
+    "Latin": LATIN_LANGUAGES,
+    "Devanagari": ["hin", "eng"],
+    "Bengali": ["ben", "eng"],
+    "Arabic": ["ara", "eng"],
+    "Cyrillic": ["rus", "eng"],
+    "Han": ["chi_sim", "chi_tra", "eng"],
+    "HanS": ["chi_sim", "eng"],
+    "HanT": ["chi_tra", "eng"],
+    "Japanese": ["jpn", "eng"],
+    "Katakana": ["jpn", "eng"],
+    "Hiragana": ["jpn", "eng"],
+    "Hangul": ["kor", "eng"],
+    "Korean": ["kor", "eng"],
+}
+
+OSD_MAX_DIM = 2000
+OSD_CACHE_SIZE = 128
+PDF_OSD_DPI = 150
+
+_osd_cache = OrderedDict()
+_osd_lock = threading.Lock()
+_installed_languages = None
+
+
+def installed_languages():
+    """Installed Tesseract language codes (queried once per process)"""
+    global _installed_languages
+    if _installed_languages is None:
+        try:
+            result = subprocess.run(
+                ["tesseract", "--list-langs"],
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=10
+            )
+            _installed_languages = [
+                line.strip()
+                for line in result.stdout.splitlines()
+                if line.strip() and not line.lower().startswith("list of")
+            ]
+        except Exception:
+            return []
+    return _installed_languages
+
+
+def _downsample_gray(img):
+    if len(img.shape) == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    h, w = img.shape
+    scale = OSD_MAX_DIM / max(h, w)
+    if scale < 1:
+        img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return img
+
+
+def detect_script(img):
+    """Run OSD on a downsampled copy of a BGR/gray image; results are cached by image hash"""
+    gray = _downsample_gray(img)
+    key = hashlib.blake2b(gray.tobytes(), digest_size=16).hexdigest() + str(gray.shape)
+
+    with _osd_lock:
+        if key in _osd_cache:
+            _osd_cache.move_to_end(key)
+            return _osd_cache[key]
+
+    try:
+        osd = pytesseract.image_to_osd(
+            Image.fromarray(gray), config="--psm 0",
+            output_type=pytesseract.Output.DICT,
+            timeout=timeout("tesseract") or 0
+        )
+        result = {
+            "script": osd.get("script"),
+            "script_confidence": float(osd.get("script_conf", 0)),
+            "rotate": int(osd.get("rotate", 0)),
+            "orientation_confidence": float(osd.get("orientation_conf", 0)),
+        }
+    except Exception as e:
+        # A timeout from the request deadline is not an OSD result to cache
+        check("tesseract")
+        # OSD fails on pages with too little text; fall back to the default
+        print(f"⚠ OSD failed: {e}")
+        result = {"script": None, "script_confidence": 0.0, "rotate": 0, "orientation_confidence": 0.0}
+
+    with _osd_lock:
+        _osd_cache[key] = result
+        if len(_osd_cache) > OSD_CACHE_SIZE:
+            _osd_cache.popitem(last=False)
+
+    return result
+
+
+def languages_for_script(script):
+    """Tesseract language string for an OSD script, limited to installed packs"""
+    wanted = SCRIPT_LANGUAGES.get(script, [DEFAULT_LANGUAGE])
+    installed = installed_languages()
+    if installed:
+        wanted = [l for l in wanted if l in installed]
+    return "+".join(wanted) or DEFAULT_LANGUAGE
+
+
+def detect_image_languages(img):
+    """Language string for an image plus the OSD details it was derived from"""
+    osd = detect_script(img)
+    return languages_for_script(osd["script"]), osd
+
+
+def detect_pdf_languages(pdf_path, page_number=0):
+    """Language string for a PDF, detected from one rendered page"""
+    try:
+        doc = fitz.open(pdf_path)
+        try:
+            if page_number >= len(doc):
+                return DEFAULT_LANGUAGE, None
+            pix = doc.load_page(page_number).get_pixmap(dpi=PDF_OSD_DPI, colorspace=fitz.csGRAY)
+            gray = np.frombuffer(pix.samples, np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+        finally:
+            doc.close()
+    except Exception as e:
+        print(f"⚠ Could not render PDF for language detection: {e}")
+        return DEFAULT_LANGUAGE, None
+
+    return detect_image_languages(np.ascontiguousarray(gray))
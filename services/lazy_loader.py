@@ -0,0 +1,88 @@
+import importlib
+import threading
+import time
+
+# Lazy blueprint registration. Route modules (and their heavy dependencies:
+# cv2, fitz, pytesseract, ocrmypdf, reportlab, ...) are imported on the first
+# request for one of their URL prefixes, or by an optional background
+# warm-up. Each module is served by its own small Flask app built with the
+# same factory as the root app; requests are dispatched by path.
+
+
+class LazyRouteModule:
+    def __init__(self, module, blueprint, prefixes):
+        self.module = module
+        self.blueprint = blueprint
+        self.prefixes = prefixes
+        self.wsgi_app = None
+        self.import_seconds = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    def matches(self, path):
+        return any(path == p or path.startswith(p + "/") for p in self.prefixes)
+
+
+class LazyDispatcher:
+    """WSGI middleware: route by path prefix to lazily created per-module apps"""
+
+    def __init__(self, default_app, app_factory, routes, package="routes"):
+        self.default_app = default_app
+        self.app_factory = app_factory
+        self.package = package
+        self.routes = [LazyRouteModule(m, bp, prefixes) for m, bp, prefixes in routes]
+
+    def load(self, route):
+        """Import a route module and build its app (once)"""
+        if route.wsgi_app is not None:
+            return route.wsgi_app
+        with route.lock:
+            if route.wsgi_app is None:
+                start = time.perf_counter()
+                try:
+                    module = importlib.import_module(f"{self.package}.{route.module}")
+                except Exception as e:
+                    route.error = str(e)
+                    raise
+                route.import_seconds = round(time.perf_counter() - start, 4)
+                print(f"Loaded {route.module} in {route.import_seconds:.3f}s")
+                route.wsgi_app = self.app_factory([getattr(module, route.blueprint)])
+        return route.wsgi_app
+
+    def load_all(self):
+        for route in self.routes:
+            try:
+                self.load(route)
+            except Exception as e:
+                print(f"⚠ Could not load {route.module}: {e}")
+
+    def start_warmup(self):
+        """Import every route module in a background thread"""
+        threading.Thread(target=self.load_all, name="route-warmup", daemon=True).start()
+
+    def import_stats(self):
+        return {
+            route.module: {
+                "loaded": route.wsgi_app is not None,
+                "import_seconds": route.import_seconds,
+                "error": route.error,
+                "prefixes": route.prefixes,
+            }
+            for route in self.routes
+        }
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        for route in self.routes:
+            if route.matches(path):
+                try:
+                    app = self.load(route)
+                except Exception:
+                    body = f'{{"error": "Route module {route.module} failed to load"}}'.encode()
+                    start_response("503 SERVICE UNAVAILABLE", [
+                        ("Content-Type", "application/json"),
+                        ("Content-Length", str(len(body))),
+                    ])
+                    return [body]
+                return app(environ, start_response)
+        return self.default_app(environ, start_response)
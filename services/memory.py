@@ -0,0 +1,99 @@
+import os
+import tracemalloc
+
+from flask import g, has_request_context
+
+# Memory accounting and per-request working-set budgets.
+#
+# RSS is read from /proc (Linux); tracemalloc adds Python-level peaks
+# (including numpy arrays) when MEMORY_TRACEMALLOC=1. Both are process-wide,
+# so per-request figures are exact only with one thread per worker (the ocr
+# serving pool) and approximate otherwise.
+#
+# Routes estimate their working set from page counts and image dimensions
+# before doing any work and raise MemoryBudgetError (HTTP 413) when it would
+# exceed MEMORY_BUDGET_MB, instead of letting the worker get OOM-killed.
+
+MB = 1024 * 1024
+MEMORY_BUDGET_BYTES = int(os.environ.get("MEMORY_BUDGET_MB", 1024)) * MB
+MEMORY_TRACEMALLOC = os.environ.get("MEMORY_TRACEMALLOC", "0") == "1"
+MEMORY_LOG_BYTES = int(os.environ.get("MEMORY_LOG_MB", 100)) * MB
+
+# Working-set model
+IMAGE_WORKING_COPIES = 4          # decoded image + colour/enhancement copies + output buffer
+PDF_BYTES_FACTOR = 3              # parsed objects and output buffer relative to file size
+PDF_PAGE_OVERHEAD = 256 * 1024    # per-page objects while a document is open
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class MemoryBudgetError(Exception):
+    """Estimated working set exceeds the per-request memory budget (HTTP 413)"""
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None when unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def start_tracing():
+    if MEMORY_TRACEMALLOC and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def traced_memory():
+    """(current, peak) bytes traced by tracemalloc, or None when not tracing"""
+    return tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None
+
+
+def reset_traced_peak():
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+
+def estimate_image(width, height, channels=3, copies=IMAGE_WORKING_COPIES):
+    """Bytes needed to decode and process one image"""
+    return width * height * channels * copies
+
+
+def estimate_pdf(size_bytes, pages, factor=PDF_BYTES_FACTOR):
+    """Bytes needed to hold a parsed PDF (and its output) in memory"""
+    return size_bytes * factor + pages * PDF_PAGE_OVERHEAD
+
+
+def image_info(file):
+    """(format, width, height, channels) from the image header without decoding pixels"""
+    from PIL import Image
+
+    try:
+        with Image.open(file.stream) as img:
+            return img.format, img.width, img.height, len(img.getbands())
+    finally:
+        file.stream.seek(0)
+
+
+def decoded_image_estimate(file, copies=IMAGE_WORKING_COPIES):
+    """Working set of an upload decoded to BGR (decode_image); 0 when the header
+    is unreadable, leaving the rejection to the decode itself"""
+    try:
+        _, width, height, _ = image_info(file)
+    except Exception:
+        return 0
+    return estimate_image(width, height, 3, copies)
+
+
+def check_budget(estimate, what, budget=MEMORY_BUDGET_BYTES):
+    """Raise MemoryBudgetError when an estimated working set exceeds the budget"""
+    if has_request_context():
+        # Kept for the request's memory log line and estimate-vs-actual metrics
+        g.memory_estimate = max(g.get("memory_estimate", 0), estimate)
+    if estimate > budget:
+        raise MemoryBudgetError(
+            f"{what}: estimated working set of {estimate / MB:.0f} MB exceeds "
+            f"the per-request memory budget of {budget / MB:.0f} MB"
+        )
+    return estimate
@@ -0,0 +1,257 @@
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess,
+)
+
+from services.memory import (
+    MB, MEMORY_LOG_BYTES, current_rss, reset_traced_peak, start_tracing, traced_memory,
+)
+
+# Prometheus instrumentation shared by every route. Under gunicorn each worker
+# writes its samples to PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py) and
+# /metrics aggregates them; without it the in-process registry is used.
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SUBPROCESS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BYTES_BUCKETS = tuple(kb * 1024 for kb in (10, 100, 1024, 5 * 1024, 10 * 1024, 25 * 1024,
+                                           50 * 1024, 100 * 1024, 200 * 1024))
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+MEMORY_BUCKETS = tuple(mb * MB for mb in (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2000, 4000))
+
+REQUESTS = Counter(
+    "scanner_requests_total", "HTTP requests handled", ["route", "method", "status"]
+)
+LATENCY = Histogram(
+    "scanner_request_duration_seconds", "Time to build the response", ["route"],
+    buckets=LATENCY_BUCKETS
+)
+IN_PROGRESS = Gauge(
+    "scanner_requests_in_progress", "Requests currently being handled", ["route"],
+    multiprocess_mode="livesum"
+)
+INPUT_BYTES = Histogram(
+    "scanner_request_input_bytes", "Request body size", ["route"], buckets=BYTES_BUCKETS
+)
+PAGES = Histogram(
+    "scanner_request_pages", "Pages or images processed per request", ["route"],
+    buckets=PAGE_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "scanner_stage_duration_seconds", "Processing stage wall time", ["route", "stage"],
+    buckets=STAGE_BUCKETS
+)
+SUBPROCESS_SECONDS = Histogram(
+    "scanner_subprocess_duration_seconds", "External tool wall time", ["tool", "outcome"],
+    buckets=SUBPROCESS_BUCKETS
+)
+REQUEST_RSS_GROWTH = Histogram(
+    "scanner_request_rss_growth_bytes", "Peak RSS growth over the request", ["route"],
+    buckets=MEMORY_BUCKETS
+)
+REQUEST_PY_PEAK = Histogram(
+    "scanner_request_python_peak_bytes", "tracemalloc peak during the request", ["route"],
+    buckets=MEMORY_BUCKETS
+)
+REQUEST_ESTIMATE = Histogram(
+    "scanner_request_memory_estimate_bytes", "Working set estimated before the work started",
+    ["route"], buckets=MEMORY_BUCKETS
+)
+STAGE_RSS_GROWTH = Histogram(
+    "scanner_stage_rss_growth_bytes", "RSS growth over a processing stage", ["route", "stage"],
+    buckets=MEMORY_BUCKETS
+)
+STAGE_PY_PEAK = Histogram(
+    "scanner_stage_python_peak_bytes", "tracemalloc peak above the stage's starting point",
+    ["route", "stage"], buckets=MEMORY_BUCKETS
+)
+PROCESS_RSS = Gauge(
+    "scanner_process_rss_bytes", "Worker resident set size after the last request",
+    multiprocess_mode="all"
+)
+
+# Open stages per thread, so a nested stage's tracemalloc peak is carried up
+# to its parent (reset_peak in the child would otherwise hide it)
+_stages = threading.local()
+
+
+def current_route():
+    """Route label for the current request: the URL rule, never the raw path"""
+    if not has_request_context():
+        return "background"
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+class StageTimer:
+    """Collects per-stage wall times in milliseconds and exports them as metrics"""
+
+    def __init__(self, timings=None):
+        self.timings = timings if timings is not None else {}
+
+    def stage(self, name):
+        return _Stage(self.timings, name)
+
+
+class _Stage:
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.rss_start = current_rss()
+        traced = traced_memory()
+        if traced:
+            reset_traced_peak()
+            self.traced_start, self.child_peak = traced[0], 0
+        stack = getattr(_stages, "stack", None)
+        if stack is None:
+            stack = _stages.stack = []
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        _stages.stack.pop()
+        route = current_route()
+        self.timings[self.name] = round(self.timings.get(self.name, 0) + elapsed * 1000, 2)
+        STAGE_SECONDS.labels(route, self.name).observe(elapsed)
+
+        memory = {}
+        rss = current_rss()
+        if rss is not None and self.rss_start is not None:
+            memory["rss_growth"] = max(0, rss - self.rss_start)
+            STAGE_RSS_GROWTH.labels(route, self.name).observe(memory["rss_growth"])
+            _note_rss(rss)
+        traced = traced_memory()
+        if traced and hasattr(self, "traced_start"):
+            peak = max(traced[1], self.child_peak)
+            memory["py_peak"] = max(0, peak - self.traced_start)
+            STAGE_PY_PEAK.labels(route, self.name).observe(memory["py_peak"])
+            if _stages.stack and hasattr(_stages.stack[-1], "child_peak"):
+                parent = _stages.stack[-1]
+                parent.child_peak = max(parent.child_peak, peak)
+            elif has_request_context():
+                g.memory_py_peak = max(g.get("memory_py_peak", 0), peak)
+        if memory and has_request_context():
+            g.setdefault("memory_stages", {})[self.name] = memory
+        return False
+
+
+class _ToolRun:
+    def __init__(self, tool):
+        self.tool = tool
+        self.outcome = "ok"
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def fail(self):
+        """Mark a run that returned normally but did not succeed (non-zero exit)"""
+        self.outcome = "error"
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None:
+            self.outcome = "error"
+        SUBPROCESS_SECONDS.labels(self.tool, self.outcome).observe(time.perf_counter() - self.start)
+        return False
+
+
+def track_subprocess(tool):
+    """Time one external tool run (gs, soffice, ocrmypdf, ...)"""
+    return _ToolRun(tool)
+
+
+def observe_pages(count):
+    """Record how many pages (or images) this request processes"""
+    if has_request_context() and count:
+        PAGES.labels(current_route()).observe(count)
+
+
+def _note_rss(rss):
+    """Track the highest RSS sampled during the current request"""
+    if has_request_context():
+        g.memory_rss_peak = max(g.get("memory_rss_peak", 0), rss)
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_route = current_route()
+    g.memory_rss_start = current_rss()
+    traced = traced_memory()
+    if traced:
+        reset_traced_peak()
+        g.memory_traced_start = traced[0]
+    IN_PROGRESS.labels(g.metrics_route).inc()
+
+
+def _record_memory(route):
+    """Export and, above MEMORY_LOG_MB, log this request's memory use"""
+    rss_start = g.pop("memory_rss_start", None)
+    rss_end = current_rss()
+    if rss_start is None or rss_end is None:
+        return
+    _note_rss(rss_end)
+    growth = g.pop("memory_rss_peak") - rss_start
+    REQUEST_RSS_GROWTH.labels(route).observe(max(0, growth))
+    PROCESS_RSS.set(rss_end)
+
+    py_peak = None
+    traced = traced_memory()
+    if traced and "memory_traced_start" in g:
+        py_peak = max(traced[1], g.pop("memory_py_peak", 0)) - g.pop("memory_traced_start")
+        REQUEST_PY_PEAK.labels(route).observe(max(0, py_peak))
+    estimate = g.pop("memory_estimate", None)
+    if estimate:
+        REQUEST_ESTIMATE.labels(route).observe(estimate)
+
+    if growth >= MEMORY_LOG_BYTES:
+        stages = {
+            name: {k: round(v / MB, 1) for k, v in values.items()}
+            for name, values in g.pop("memory_stages", {}).items()
+        }
+        print(
+            f"Memory {request.method} {route}: RSS {rss_start / MB:.0f} -> {rss_end / MB:.0f} MB "
+            f"(peak +{growth / MB:.0f} MB)"
+            + (f", python peak {py_peak / MB:.0f} MB" if py_peak is not None else "")
+            + (f", estimated {estimate / MB:.0f} MB" if estimate else "")
+            + (f", stages {stages}" if stages else "")
+        )
+
+
+def _after_request(response):
+    start = g.pop("metrics_start", None)
+    if start is not None:
+        route = g.pop("metrics_route")
+        IN_PROGRESS.labels(route).dec()
+        LATENCY.labels(route).observe(time.perf_counter() - start)
+        REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+        if request.content_length:
+            INPUT_BYTES.labels(route).observe(request.content_length)
+        _record_memory(route)
+    return response
+
+
+def init_metrics(app):
+    """Record request count, latency, input size and memory for every route of an app"""
+    start_tracing()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+
+def render_metrics():
+    """(body, content type) in the Prometheus text format"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
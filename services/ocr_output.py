@@ -0,0 +1,170 @@
+from xml.sax.saxutils import escape, quoteattr
+
+# Structured OCR output built from a single pytesseract.image_to_data pass.
+# Boxes are reported as [x0, y0, x1, y1] in original image pixels.
+OUTPUT_FORMATS = ("text", "json", "hocr", "alto")
+
+
+def _scale_box(left, top, width, height, scale):
+    return [
+        int(round(left * scale)),
+        int(round(top * scale)),
+        int(round((left + width) * scale)),
+        int(round((top + height) * scale)),
+    ]
+
+
+def _union(boxes):
+    return [
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
+    ]
+
+
+def _mean(values):
+    return round(sum(values) / len(values), 2) if values else 0.0
+
+
+def parse_ocr_data(data, scale=1.0):
+    """Group image_to_data output into lines/words and compute text + mean confidence"""
+    lines = []
+    current = None
+    current_key = None
+    last_par = None
+
+    for i in range(len(data["text"])):
+        text = str(data["text"][i]).strip()
+        conf = float(data["conf"][i])
+        if not text or conf < 0:
+            continue
+
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        if key != current_key:
+            current = {
+                "block": data["block_num"][i],
+                "paragraph": data["par_num"][i],
+                "words": [],
+            }
+            lines.append(current)
+            current_key = key
+
+        current["words"].append({
+            "text": text,
+            "confidence": round(conf, 2),
+            "bbox": _scale_box(data["left"][i], data["top"][i],
+                               data["width"][i], data["height"][i], scale),
+        })
+
+    text_parts = []
+    for line in lines:
+        line["text"] = " ".join(w["text"] for w in line["words"])
+        line["bbox"] = _union([w["bbox"] for w in line["words"]])
+        line["confidence"] = _mean([w["confidence"] for w in line["words"]])
+
+        par = (line["block"], line["paragraph"])
+        if text_parts and par != last_par:
+            text_parts.append("")
+        text_parts.append(line["text"])
+        last_par = par
+
+    word_confs = [w["confidence"] for line in lines for w in line["words"]]
+
+    return {
+        "text": "\n".join(text_parts),
+        "mean_confidence": _mean(word_confs),
+        "word_count": len(word_confs),
+        "lines": lines,
+    }
+
+
+def transform_boxes(result, matrix, width, height):
+    """Map every word box through a 2x3 affine matrix, e.g. the inverse of a
+    deskew rotation. A box becomes the axis-aligned hull of its transformed
+    corners, clipped to width x height; line boxes are rebuilt from the words."""
+    (a, b, c), (d, e, f) = matrix
+    for line in result["lines"]:
+        for word in line["words"]:
+            x0, y0, x1, y1 = word["bbox"]
+            corners = [(x, y) for x in (x0, x1) for y in (y0, y1)]
+            xs = [a * x + b * y + c for x, y in corners]
+            ys = [d * x + e * y + f for x, y in corners]
+            word["bbox"] = [
+                max(0, int(round(min(xs)))),
+                max(0, int(round(min(ys)))),
+                min(width, int(round(max(xs)))),
+                min(height, int(round(max(ys)))),
+            ]
+        line["bbox"] = _union([w["bbox"] for w in line["words"]])
+    return result
+
+
+def to_hocr(result, width, height):
+    """Render a parsed OCR result as an hOCR document"""
+    out = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" '
+        '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">',
+        '<html xmlns="http://www.w3.org/1999/xhtml">',
+        '<head><meta http-equiv="Content-Type" content="text/html; charset=utf-8" />',
+        '<meta name="ocr-system" content="tesseract" />',
+        "<meta name=\"ocr-capabilities\" content=\"ocr_page ocr_line ocrx_word\" /></head>",
+        "<body>",
+        f"<div class='ocr_page' id='page_1' title='bbox 0 0 {width} {height}'>",
+    ]
+
+    word_id = 0
+    for line_id, line in enumerate(result["lines"], start=1):
+        x0, y0, x1, y1 = line["bbox"]
+        out.append(f"<span class='ocr_line' id='line_{line_id}' title='bbox {x0} {y0} {x1} {y1}'>")
+        for word in line["words"]:
+            word_id += 1
+            wx0, wy0, wx1, wy1 = word["bbox"]
+            out.append(
+                f"<span class='ocrx_word' id='word_{word_id}' "
+                f"title='bbox {wx0} {wy0} {wx1} {wy1}; x_wconf {int(word['confidence'])}'>"
+                f"{escape(word['text'])}</span>"
+            )
+        out.append("</span>")
+
+    out.extend(["</div>", "</body>", "</html>"])
+    return "\n".join(out)
+
+
+def to_alto(result, width, height):
+    """Render a parsed OCR result as an ALTO v4 document"""
+    out = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<alto xmlns="http://www.loc.gov/standards/alto/ns-v4#">',
+        "<Description><MeasurementUnit>pixel</MeasurementUnit></Description>",
+        "<Layout>",
+        f'<Page ID="page_1" PHYSICAL_IMG_NR="1" WIDTH="{width}" HEIGHT="{height}">',
+        f'<PrintSpace HPOS="0" VPOS="0" WIDTH="{width}" HEIGHT="{height}">',
+    ]
+
+    blocks = {}
+    for line in result["lines"]:
+        blocks.setdefault(line["block"], []).append(line)
+
+    word_id = 0
+    for block_num, block_lines in blocks.items():
+        bx0, by0, bx1, by1 = _union([l["bbox"] for l in block_lines])
+        out.append(f'<TextBlock ID="block_{block_num}" HPOS="{bx0}" VPOS="{by0}" '
+                   f'WIDTH="{bx1 - bx0}" HEIGHT="{by1 - by0}">')
+        for line in block_lines:
+            x0, y0, x1, y1 = line["bbox"]
+            out.append(f'<TextLine HPOS="{x0}" VPOS="{y0}" WIDTH="{x1 - x0}" HEIGHT="{y1 - y0}">')
+            for word in line["words"]:
+                word_id += 1
+                wx0, wy0, wx1, wy1 = word["bbox"]
+                out.append(
+                    f'<String ID="word_{word_id}" HPOS="{wx0}" VPOS="{wy0}" '
+                    f'WIDTH="{wx1 - wx0}" HEIGHT="{wy1 - wy0}" '
+                    f'WC="{word["confidence"] / 100:.2f}" CONTENT={quoteattr(word["text"])}/>'
+                )
+            out.append("</TextLine>")
+        out.append("</TextBlock>")
+
+    out.extend(["</PrintSpace>", "</Page>", "</Layout>", "</alto>"])
+    return "\n".join(out)
@@ -0,0 +1,112 @@
+import hashlib
+import os
+
+import pikepdf
+
+from services.ghostscript import PROFILES
+from services.pdf_optimizer import image_dpi_map
+
+# Read-only inspection of a PDF for the /compress-pdf dry run. Nothing is
+# decoded or rewritten; predictions are heuristics from stream sizes and
+# effective image DPI.
+
+# Rough JPEG size ratio relative to a typical q85 source image
+_JPEG_QUALITY_FACTOR = {30: 0.25, 40: 0.35, 50: 0.45, 60: 0.55, 70: 0.65, 85: 0.9}
+# What pdfwrite typically saves on fonts (subsetting) and other structure
+_FONT_FACTOR = 0.7
+_OTHER_FACTOR = 0.9
+
+_FONT_FILE_KEYS = ("/FontFile", "/FontFile2", "/FontFile3")
+
+
+def _quality_factor(jpegq):
+    if jpegq is None:
+        return 1.0
+    nearest = min(_JPEG_QUALITY_FACTOR, key=lambda q: abs(q - jpegq))
+    return _JPEG_QUALITY_FACTOR[nearest]
+
+
+def analyze_pdf(input_path):
+    """Image, font and duplicate-stream statistics plus per-profile size predictions"""
+    file_size = os.path.getsize(input_path)
+    dpis = image_dpi_map(input_path)
+
+    images = []
+    font_bytes = 0
+    font_xrefs = set()
+    stream_hashes = {}
+    duplicate_streams = 0
+    duplicate_bytes = 0
+
+    with pikepdf.open(input_path) as pdf:
+        page_count = len(pdf.pages)
+
+        for obj in pdf.objects:
+            if isinstance(obj, pikepdf.Dictionary) and obj.get("/Type") == pikepdf.Name.FontDescriptor:
+                for key in _FONT_FILE_KEYS:
+                    font_file = obj.get(key)
+                    if font_file is not None and font_file.is_indirect:
+                        font_xrefs.add(font_file.objgen)
+
+        for obj in pdf.objects:
+            if not isinstance(obj, pikepdf.Stream):
+                continue
+            raw = obj.read_raw_bytes()
+            size = len(raw)
+
+            digest = hashlib.sha1(raw).digest()
+            if digest in stream_hashes:
+                duplicate_streams += 1
+                duplicate_bytes += size
+            else:
+                stream_hashes[digest] = obj.objgen
+
+            if obj.objgen in font_xrefs:
+                font_bytes += size
+            elif obj.get("/Subtype") == pikepdf.Name.Image:
+                xref = obj.objgen[0]
+                dpi = dpis.get(xref)
+                images.append({
+                    "xref": xref,
+                    "width": int(obj.get("/Width", 0)),
+                    "height": int(obj.get("/Height", 0)),
+                    "bytes": size,
+                    "filter": str(obj.get("/Filter", "")),
+                    "dpi": round(dpi, 1) if dpi else None,
+                })
+
+    image_bytes = sum(i["bytes"] for i in images)
+    other_bytes = max(0, file_size - image_bytes - font_bytes)
+
+    predictions = {}
+    for name, settings in PROFILES.items():
+        predicted_images = 0
+        for img in images:
+            size = img["bytes"]
+            if settings["dpi"] and img["dpi"] and img["dpi"] > settings["dpi"]:
+                size *= (settings["dpi"] / img["dpi"]) ** 2
+            predicted_images += size * _quality_factor(settings["jpegq"])
+
+        predicted = (
+            predicted_images
+            + font_bytes * _FONT_FACTOR
+            + other_bytes * _OTHER_FACTOR
+            - duplicate_bytes
+        )
+        predicted = int(min(file_size, max(predicted, file_size * 0.02)))
+        predictions[name] = {
+            "predicted_size": predicted,
+            "predicted_saving": round(1 - predicted / file_size, 3) if file_size else 0,
+        }
+
+    return {
+        "file_size": file_size,
+        "page_count": page_count,
+        "image_count": len(images),
+        "image_bytes": image_bytes,
+        "font_bytes": font_bytes,
+        "duplicate_streams": duplicate_streams,
+        "duplicate_bytes": duplicate_bytes,
+        "images": images,
+        "predictions": predictions,
+    }
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+# Disk-backed caches shared by all workers: uploaded PDFs for follow-up
+# requests (edit-pdf image extraction, page thumbnails) and rendered
+# thumbnails. Entries are pruned by total size and age instead of growing a
+# per-process dict.
+
+PDF_CACHE_DIR = os.environ.get("PDF_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "scanner-pdf-cache")
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_MB", 512)) * 1024 * 1024
+PDF_CACHE_MAX_AGE = int(os.environ.get("PDF_CACHE_MAX_AGE", 3600))
+
+_KEY_RE = re.compile(r"^[0-9a-z][0-9a-z_.-]*$")
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class DiskCache:
+    """Files keyed by name in one directory, bounded by total size and age"""
+
+    def __init__(self, root, max_bytes, max_age, suffix=""):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.suffix = suffix
+        self.lock = threading.Lock()
+
+    def _valid(self, key):
+        return bool(key) and _KEY_RE.match(key) is not None
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}{self.suffix}")
+
+    def store(self, key, data, prune=True):
+        """Write an entry; returns its path. Batch writers pass prune=False
+        and call prune() once at the end."""
+        path = self._path(key)
+        os.makedirs(self.root, exist_ok=True)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            # Write then rename so other workers never read a partial file
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        if prune:
+            self.prune()
+        return path
+
+    def path(self, key):
+        """Path of a cached entry, or None when unknown or evicted"""
+        if not self._valid(key):
+            return None
+        path = self._path(key)
+        try:
+            os.utime(path)  # recently used entries are pruned last
+        except FileNotFoundError:
+            return None
+        return path
+
+    def prune(self):
+        """Drop expired entries, then the oldest until under max_bytes"""
+        os.makedirs(self.root, exist_ok=True)
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.root):
+                if entry.name.endswith(".tmp") or not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+
+            cutoff = time.time() - self.max_age
+            total = sum(size for _, size, _ in entries)
+            for mtime, size, path in sorted(entries):
+                if mtime >= cutoff and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+class PdfCache(DiskCache):
+    """Content-addressed store of uploaded PDFs"""
+
+    def __init__(self, root=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES, max_age=PDF_CACHE_MAX_AGE):
+        super().__init__(root, max_bytes, max_age, suffix=".pdf")
+
+    def _valid(self, pdf_id):
+        return bool(pdf_id) and _ID_RE.match(pdf_id) is not None
+
+    @staticmethod
+    def content_id(content):
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    def put(self, content):
+        """Store PDF bytes; returns their id"""
+        pdf_id = self.content_id(content)
+        self.store(pdf_id, content)
+        return pdf_id
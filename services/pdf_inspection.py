@@ -0,0 +1,140 @@
+import pikepdf
+
+# Lightweight structural inspection for clients that need page counts and
+# sizes before calling the page routes. qpdf reads the xref table and resolves
+# only the objects touched here (page tree, page dictionaries and their
+# resources); content streams and images are never decoded, so the cost
+# depends on the page count, not the file size.
+
+# Nested form XObjects followed when looking for fonts and images
+_MAX_FORM_DEPTH = 4
+# A4, used when a broken file has no MediaBox anywhere
+_DEFAULT_MEDIABOX = [0, 0, 595, 842]
+
+
+def _inherited(node, key, memo, depth=0):
+    """Attribute of a page or, failing that, of its nearest ancestor defining it.
+    memo caches page tree nodes, which large documents share across many pages."""
+    value = node.get(key)
+    if value is not None:
+        return value
+    parent = node.get("/Parent")
+    if parent is None or depth > 64:  # depth guards against cyclic /Parent chains
+        return None
+    memo_key = (parent.objgen, key)
+    if memo_key not in memo:
+        memo[memo_key] = _inherited(parent, key, memo, depth + 1)
+    return memo[memo_key]
+
+
+def _box(value, default):
+    try:
+        x0, y0, x1, y1 = (float(v) for v in value)
+    except (TypeError, ValueError):
+        return default
+    return [min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)]
+
+
+def _resource_flags(resources, depth=0, seen=None):
+    """(has_fonts, has_images) from a resource dictionary and its form XObjects"""
+    if not isinstance(resources, pikepdf.Dictionary):
+        return False, False
+    seen = seen if seen is not None else set()
+    fonts = resources.get("/Font")
+    has_text = isinstance(fonts, pikepdf.Dictionary) and len(fonts.keys()) > 0
+    has_images = False
+
+    xobjects = resources.get("/XObject")
+    if isinstance(xobjects, pikepdf.Dictionary):
+        for name in xobjects.keys():
+            xobj = xobjects.get(name)
+            if not isinstance(xobj, pikepdf.Stream):
+                continue
+            subtype = xobj.get("/Subtype")
+            if subtype == pikepdf.Name.Image:
+                has_images = True
+            elif subtype == pikepdf.Name.Form and depth < _MAX_FORM_DEPTH:
+                if xobj.is_indirect:
+                    if xobj.objgen in seen:
+                        continue
+                    seen.add(xobj.objgen)
+                text, images = _resource_flags(xobj.get("/Resources"), depth + 1, seen)
+                has_text = has_text or text
+                has_images = has_images or images
+            if has_text and has_images:
+                break
+    return has_text, has_images
+
+
+def _page_info(number, page, memo):
+    media_box = _box(_inherited(page, "/MediaBox", memo), _DEFAULT_MEDIABOX)
+    crop_box = _box(_inherited(page, "/CropBox", memo), media_box)
+    try:
+        rotation = int(_inherited(page, "/Rotate", memo) or 0) % 360
+    except (TypeError, ValueError):
+        rotation = 0
+    width, height = crop_box[2] - crop_box[0], crop_box[3] - crop_box[1]
+    if rotation in (90, 270):
+        width, height = height, width
+    has_text, has_images = _resource_flags(_inherited(page, "/Resources", memo))
+    return {
+        "page": number,
+        "media_box": media_box,
+        "crop_box": crop_box,
+        "rotation": rotation,
+        # Displayed size in points: crop box after rotation
+        "width": round(width, 2),
+        "height": round(height, 2),
+        # From page resources: fonts (text) and image XObjects, including
+        # those of nested forms; inline images are not detected
+        "has_text": has_text,
+        "has_images": has_images,
+    }
+
+
+def _permissions(pdf):
+    allow = pdf.allow
+    return {
+        "print": allow.print_lowres or allow.print_highres,
+        "modify": allow.modify_other,
+        "extract": allow.extract,
+        "annotate": allow.modify_annotation,
+        "fill_forms": allow.modify_form,
+        "assemble": allow.modify_assembly,
+    }
+
+
+def inspect_pdf(source, password=""):
+    """Page count, per-page boxes/rotation/content flags, encryption and linearization.
+
+    source is a path or a seekable binary stream."""
+    try:
+        pdf = pikepdf.open(source, password=password)
+    except pikepdf.PasswordError:
+        return {
+            "encrypted": True,
+            "needs_password": True,
+            "page_count": None,
+            "pages": [],
+        }
+
+    with pdf:
+        encryption = None
+        if pdf.is_encrypted:
+            info = pdf.encryption
+            encryption = {
+                "method": str(info.stream_method).rsplit(".", 1)[-1],
+                "bits": info.bits,
+                "permissions": _permissions(pdf),
+            }
+        memo = {}
+        pages = [_page_info(i + 1, page.obj, memo) for i, page in enumerate(pdf.pages)]
+        return {
+            "pdf_version": pdf.pdf_version,
+            "page_count": len(pages),
+            "encrypted": pdf.is_encrypted,
+            "needs_password": False,
+            "encryption": encryption,
+            "linearized": pdf.is_linearized,
+            "pages": pages,
+        }
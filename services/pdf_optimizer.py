@@ -0,0 +1,168 @@
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+import pikepdf
+from PIL import Image
+
+# Structural PDF optimizer: duplicate image dedup, per-image downsampling,
+# stream recompression and object-stream packing. Text and vector content
+# are written back untouched, so this is a fast path before Ghostscript.
+
+OPTIMIZER_WORKERS = int(os.environ.get("OPTIMIZER_WORKERS", os.cpu_count() or 2))
+
+# Images are only re-encoded when they are this much above the target DPI
+DOWNSAMPLE_THRESHOLD = 1.25
+
+_SUPPORTED_COLORSPACES = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}
+
+
+def image_dpi_map(input_path):
+    """Highest effective DPI of each image xref across all its placements"""
+    dpis = {}
+    with fitz.open(input_path) as doc:
+        for page in doc:
+            for info in page.get_image_info(xrefs=True):
+                xref = info.get("xref")
+                bbox = fitz.Rect(info["bbox"])
+                if not xref or bbox.is_empty or bbox.width <= 0:
+                    continue
+                dpi = max(
+                    info["width"] / (bbox.width / 72.0),
+                    info["height"] / (bbox.height / 72.0) if bbox.height > 0 else 0
+                )
+                dpis[xref] = max(dpis.get(xref, 0), dpi)
+    return dpis
+
+
+def _image_mode(obj):
+    """Pillow mode for images we can safely re-encode, else None"""
+    if obj.get("/ImageMask", False) or obj.get("/BitsPerComponent") != 8 or "/Decode" in obj:
+        return None
+    cs = obj.get("/ColorSpace")
+    if isinstance(cs, pikepdf.Name):
+        return _SUPPORTED_COLORSPACES.get(str(cs))
+    if isinstance(cs, pikepdf.Array) and len(cs) == 2 and cs[0] == pikepdf.Name.ICCBased:
+        return {1: "L", 3: "RGB"}.get(int(cs[1].get("/N", 0)))
+    return None
+
+
+def _filters(obj):
+    f = obj.get("/Filter")
+    if f is None:
+        return []
+    if isinstance(f, pikepdf.Array):
+        return [str(x) for x in f]
+    return [str(f)]
+
+
+def _recompress(job):
+    """Worker: decode, resize and JPEG-encode one image (Pillow releases the GIL)"""
+    try:
+        return _recompress_image(*job)
+    except Exception as e:
+        print(f"⚠ Image recompression skipped: {e}")
+        return None
+
+
+def _recompress_image(kind, data, width, height, mode, scale, quality):
+    if kind == "jpeg":
+        img = Image.open(io.BytesIO(data))
+        img.draft(mode, (int(width * scale), int(height * scale)))
+        img = img.convert(mode)
+    else:
+        img = Image.frombytes(mode, (width, height), data)
+
+    new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    if new_size != img.size:
+        img = img.resize(new_size, Image.LANCZOS)
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue(), img.size
+
+
+def _dedupe_images(pdf):
+    """Point every duplicate image XObject at one canonical object"""
+    canonical = {}
+    removed = 0
+    for page in pdf.pages:
+        xobjects = page.obj.get("/Resources", {}).get("/XObject", {})
+        for name in list(xobjects.keys()):
+            obj = xobjects[name]
+            if obj.get("/Subtype") != pikepdf.Name.Image or not obj.is_indirect:
+                continue
+            digest = hashlib.sha1(obj.read_raw_bytes()).hexdigest()
+            key = (digest, str(obj.get("/Width")), str(obj.get("/Height")),
+                   str(obj.get("/Filter")), str(obj.get("/SMask", "")))
+            first = canonical.setdefault(key, obj)
+            if first.objgen != obj.objgen:
+                xobjects[name] = first
+                removed += 1
+    return removed
+
+
+def optimize_pdf(input_path, output_path, max_dpi=None, jpeg_quality=75, workers=OPTIMIZER_WORKERS):
+    """
+    Rewrite a PDF structurally. When max_dpi is set, 8-bit RGB/gray images
+    placed above it are downsampled in parallel. Returns a stats dict.
+    """
+    stats = {"duplicates_removed": 0, "images_downsampled": 0}
+    dpis = image_dpi_map(input_path) if max_dpi else {}
+
+    with pikepdf.open(input_path) as pdf:
+        stats["duplicates_removed"] = _dedupe_images(pdf)
+
+        jobs, targets = [], []
+        for xref, dpi in dpis.items():
+            if dpi <= max_dpi * DOWNSAMPLE_THRESHOLD:
+                continue
+            try:
+                obj = pdf.get_object((xref, 0))
+            except Exception:
+                continue
+            mode = _image_mode(obj)
+            if mode is None:
+                continue
+
+            filters = _filters(obj)
+            if filters == ["/DCTDecode"]:
+                kind, data = "jpeg", obj.read_raw_bytes()
+            elif all(f == "/FlateDecode" for f in filters) and "/DecodeParms" not in obj:
+                kind, data = "raw", obj.read_bytes()
+            else:
+                continue
+
+            width, height = int(obj.Width), int(obj.Height)
+            jobs.append((kind, data, width, height, mode, max_dpi / dpi, jpeg_quality))
+            targets.append(obj)
+
+        if jobs:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_recompress, jobs))
+
+            for obj, result in zip(targets, results):
+                if result is None:
+                    continue
+                jpeg_bytes, (w, h) = result
+                if len(jpeg_bytes) >= len(obj.read_raw_bytes()):
+                    continue
+                obj.write(jpeg_bytes, filter=pikepdf.Name.DCTDecode)
+                obj.Width, obj.Height = w, h
+                obj.BitsPerComponent = 8
+                if "/DecodeParms" in obj:
+                    del obj["/DecodeParms"]
+                stats["images_downsampled"] += 1
+
+        pdf.remove_unreferenced_resources()
+        pdf.save(
+            output_path,
+            compress_streams=True,
+            recompress_flate=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+        )
+
+    stats["size"] = os.path.getsize(output_path)
+    return stats
@@ -0,0 +1,170 @@
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import g, request
+
+# On-demand request profiling. A request is profiled when it carries
+# "X-Profile: 1" with a valid X-Admin-Token, or at random with probability
+# PROFILE_SAMPLE_RATE. A sampler thread records the handler thread's stack
+# every PROFILE_INTERVAL_MS and writes folded stacks ("a;b;c 12" per line,
+# the input format of flamegraph.pl and speedscope) named by request id.
+# Profiles live on disk so any worker can serve them; the oldest are pruned
+# beyond PROFILE_STORE_SIZE.
+
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_STORE_SIZE = int(os.environ.get("PROFILE_STORE_SIZE", 20))
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "scanner-profiles")
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_prune_lock = threading.Lock()
+
+
+def admin_authorized():
+    """True when the request carries the configured admin token"""
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def request_id():
+    """Upstream X-Request-ID when it is safe to use as a file name, else a new id"""
+    rid = request.headers.get("X-Request-ID", "")
+    return rid if _REQUEST_ID_RE.match(rid) else uuid.uuid4().hex
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class StackSampler:
+    """Statistical profiler for one thread: counts folded stacks"""
+
+    def __init__(self, thread_id, interval_ms=PROFILE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _should_profile():
+    if request.headers.get("X-Profile") == "1" and admin_authorized():
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _profile_path(profile_id, ext):
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{ext}")
+
+
+def save_profile(profile_id, sampler, meta):
+    """Write <id>.folded and <id>.json, then prune the store to PROFILE_STORE_SIZE"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(_profile_path(profile_id, "folded"), "w") as f:
+        f.write(sampler.folded())
+    meta = dict(meta, id=profile_id, samples=sampler.samples,
+                duration_ms=round(sampler.duration * 1000, 2),
+                interval_ms=sampler.interval * 1000, created=time.time())
+    with open(_profile_path(profile_id, "json"), "w") as f:
+        json.dump(meta, f)
+
+    with _prune_lock:
+        for old in list_profiles()[PROFILE_STORE_SIZE:]:
+            for ext in ("folded", "json"):
+                try:
+                    os.remove(_profile_path(old["id"], ext))
+                except FileNotFoundError:
+                    pass
+
+
+def list_profiles():
+    """Stored profile metadata, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.name.endswith(".json"):
+            try:
+                with open(entry.path) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda p: p.get("created", 0), reverse=True)
+
+
+def load_profile(profile_id):
+    """Folded stacks for a stored profile, or None"""
+    if not _REQUEST_ID_RE.match(profile_id):
+        return None
+    try:
+        with open(_profile_path(profile_id, "folded")) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _before_request():
+    if _should_profile():
+        g.profile_id = request_id()
+        g.profiler = StackSampler(threading.get_ident()).start()
+
+
+def _after_request(response):
+    sampler = g.pop("profiler", None)
+    if sampler is not None:
+        sampler.stop()
+        profile_id = g.pop("profile_id")
+        try:
+            save_profile(profile_id, sampler, {
+                "route": request.url_rule.rule if request.url_rule else request.path,
+                "method": request.method,
+                "status": response.status_code,
+            })
+            response.headers["X-Profile-Id"] = profile_id
+        except OSError as e:
+            print(f"Could not save profile {profile_id}: {e}")
+    return response
+
+
+def init_profiling(app):
+    """Profile opted-in requests to any route of an app"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from flask import g, has_request_context
+from prometheus_client import Gauge
+
+# Per-request scratch space. Each request gets its own directory under
+# SCRATCH_ROOT, created on first use and removed once the response has been
+# fully sent (or immediately when the request fails). A background reaper
+# removes directories orphaned by crashed workers.
+
+SCRATCH_TMPFS = os.environ.get("SCRATCH_TMPFS", "0") == "1" and os.path.isdir("/dev/shm")
+SCRATCH_ROOT = os.environ.get("SCRATCH_ROOT") or os.path.join(
+    "/dev/shm" if SCRATCH_TMPFS else tempfile.gettempdir(), "scanner-scratch"
+)
+SCRATCH_MAX_AGE = int(os.environ.get("SCRATCH_MAX_AGE", 3600))
+SCRATCH_REAP_INTERVAL = int(os.environ.get("SCRATCH_REAP_INTERVAL", 300))
+
+# The scratch root is shared by all workers, so whichever worker measured it
+# last has the current value
+SCRATCH_BYTES = Gauge(
+    "scanner_scratch_bytes", "Disk used by request scratch directories",
+    multiprocess_mode="mostrecent"
+)
+SCRATCH_DIRECTORIES = Gauge(
+    "scanner_scratch_directories", "Request scratch directories on disk",
+    multiprocess_mode="mostrecent"
+)
+SCRATCH_FREE_BYTES = Gauge(
+    "scanner_scratch_filesystem_free_bytes", "Free space on the scratch filesystem",
+    multiprocess_mode="mostrecent"
+)
+
+_stats_lock = threading.Lock()
+_stats = {"created_total": 0, "cleaned_total": 0, "reaped_total": 0, "active": 0}
+_reaper_started = False
+
+
+def _new_dir(prefix="req_"):
+    os.makedirs(SCRATCH_ROOT, exist_ok=True)
+    path = os.path.join(SCRATCH_ROOT, f"{prefix}{os.getpid()}_{uuid.uuid4().hex}")
+    os.mkdir(path)
+    with _stats_lock:
+        _stats["created_total"] += 1
+        _stats["active"] += 1
+    return path
+
+
+def _remove_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
+    with _stats_lock:
+        _stats["cleaned_total"] += 1
+        _stats["active"] = max(0, _stats["active"] - 1)
+
+
+def scratch_dir():
+    """This request's scratch directory (created on first call)"""
+    if not has_request_context():
+        raise RuntimeError("scratch_dir() needs a request context; use a TemporaryDirectory instead")
+    if "scratch_dir" not in g:
+        g.scratch_dir = _new_dir()
+    return g.scratch_dir
+
+
+def scratch_path(name):
+    """Path for a file inside this request's scratch directory"""
+    return os.path.join(scratch_dir(), os.path.basename(name))
+
+
+def _after_request(response):
+    path = g.pop("scratch_dir", None)
+    if path:
+        if response.direct_passthrough:
+            # send_file: the file is already open and werkzeug never runs
+            # call_on_close callbacks for passthrough bodies. The open handle
+            # keeps the data readable after unlink, so remove right away.
+            _remove_dir(path)
+        else:
+            # Streaming responses still read from scratch; clean up once closed
+            response.call_on_close(lambda: _remove_dir(path))
+    return response
+
+
+def _teardown_request(exc):
+    # after_request never ran (unhandled error): nothing is streaming from it
+    path = g.pop("scratch_dir", None)
+    if path:
+        _remove_dir(path)
+
+
+def reap_orphans(max_age=SCRATCH_MAX_AGE):
+    """Remove scratch directories older than max_age seconds; returns count"""
+    if not os.path.isdir(SCRATCH_ROOT):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(SCRATCH_ROOT):
+        try:
+            if entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    if removed:
+        with _stats_lock:
+            _stats["reaped_total"] += removed
+        print(f"Scratch reaper removed {removed} orphaned directories")
+    return removed
+
+
+def _reaper_loop():
+    while True:
+        time.sleep(SCRATCH_REAP_INTERVAL)
+        try:
+            reap_orphans()
+        except Exception as e:
+            print(f"Scratch reaper error: {e}")
+
+
+def start_reaper():
+    global _reaper_started
+    if not _reaper_started:
+        _reaper_started = True
+        threading.Thread(target=_reaper_loop, name="scratch-reaper", daemon=True).start()
+
+
+def restart_after_fork():
+    """Restart the reaper in a forked worker (threads are not inherited)"""
+    global _reaper_started
+    _reaper_started = False
+    with _stats_lock:
+        _stats.update(created_total=0, cleaned_total=0, reaped_total=0, active=0)
+    start_reaper()
+
+
+def scratch_usage():
+    """Disk usage and lifecycle counters for the scratch root; also updates the gauges"""
+    directories = 0
+    total_bytes = 0
+    if os.path.isdir(SCRATCH_ROOT):
+        for root, dirs, files in os.walk(SCRATCH_ROOT):
+            if root == SCRATCH_ROOT:
+                directories = len(dirs)
+            for f in files:
+                try:
+                    total_bytes += os.path.getsize(os.path.join(root, f))
+                except OSError:
+                    pass
+
+    fs = shutil.disk_usage(SCRATCH_ROOT if os.path.isdir(SCRATCH_ROOT) else tempfile.gettempdir())
+    with _stats_lock:
+        counters = dict(_stats)
+
+    SCRATCH_BYTES.set(total_bytes)
+    SCRATCH_DIRECTORIES.set(directories)
+    SCRATCH_FREE_BYTES.set(fs.free)
+    return {
+        "root": SCRATCH_ROOT,
+        "tmpfs": SCRATCH_TMPFS,
+        "directories": directories,
+        "bytes": total_bytes,
+        "filesystem_free_bytes": fs.free,
+        "filesystem_total_bytes": fs.total,
+        **counters,
+    }
+
+
+def init_scratch(app):
+    """Register per-request cleanup hooks and start the orphan reaper"""
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    if not _reaper_started:
+        reap_orphans()
+        start_reaper()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+from io import BytesIO
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from services.deadline import DeadlinePool
+from services.pdf_cache import DiskCache
+
+# Page thumbnails rendered with PyMuPDF at a requested width and encoded as
+# WebP or JPEG. Pages are split across a process pool (PyMuPDF is not
+# thread-safe), each worker opening the document once for its share of pages.
+# Results are cached on disk by document content hash, page, width and format.
+
+THUMB_WORKERS = int(os.environ.get("THUMB_WORKERS", min(4, os.cpu_count() or 1)))
+THUMB_QUALITY = int(os.environ.get("THUMB_QUALITY", 75))
+THUMB_CACHE_DIR = os.environ.get("THUMB_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "scanner-thumbnails")
+THUMB_CACHE_MAX_BYTES = int(os.environ.get("THUMB_CACHE_MAX_MB", 256)) * 1024 * 1024
+THUMB_CACHE_MAX_AGE = int(os.environ.get("THUMB_CACHE_MAX_AGE", 7 * 24 * 3600))
+
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+
+thumbnail_cache = DiskCache(THUMB_CACHE_DIR, THUMB_CACHE_MAX_BYTES, THUMB_CACHE_MAX_AGE)
+
+_pool = DeadlinePool(THUMB_WORKERS)
+
+
+def thumbnail_key(pdf_id, page, width, fmt):
+    return f"{pdf_id}-{page}-{width}.{fmt}"
+
+
+def render_page(page, width, fmt, quality=THUMB_QUALITY):
+    """Encoded thumbnail of one fitz page scaled to width pixels"""
+    zoom = width / page.rect.width
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    out = BytesIO()
+    img.save(out, format=FORMATS[fmt][0], quality=quality)
+    return out.getvalue()
+
+
+def _render_pages(job):
+    """Worker: render a share of a document's pages; returns [(page, bytes)]"""
+    pdf_path, pages, width, fmt = job
+    with fitz.open(pdf_path) as doc:
+        return [(n, render_page(doc[n - 1], width, fmt)) for n in pages]
+
+
+def render_thumbnails(pdf_id, pdf_path, pages, width, fmt):
+    """Render the pages (1-based) missing from the cache; returns how many were rendered"""
+    missing = [n for n in pages if thumbnail_cache.path(thumbnail_key(pdf_id, n, width, fmt)) is None]
+    if not missing:
+        return 0
+
+    # Interleaved shares so every worker gets a similar mix of pages
+    shares = min(THUMB_WORKERS, len(missing))
+    jobs = [(pdf_path, missing[i::shares], width, fmt) for i in range(shares)]
+    try:
+        for rendered in _pool.map(_render_pages, jobs, "thumbnails"):
+            for n, data in rendered:
+                thumbnail_cache.store(thumbnail_key(pdf_id, n, width, fmt), data, prune=False)
+    finally:
+        thumbnail_cache.prune()
+    return len(missing)
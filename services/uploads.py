@@ -0,0 +1,178 @@
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from functools import wraps
+from io import BytesIO
+
+from flask import Request, jsonify, request
+from werkzeug.utils import secure_filename
+
+from services.metrics import observe_pages
+
+# Upload layer: multipart files are kept in memory up to UPLOAD_SPOOL_THRESHOLD
+# and spooled to a named file on disk beyond it. Routes get memory-mapped
+# buffers (OpenCV) or a file path (PyMuPDF) instead of a full bytes copy.
+# cv2/numpy/fitz are imported inside the helpers: app.py imports this module
+# at startup and must stay light (see services/lazy_loader.py).
+
+MB = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", 200)) * MB
+UPLOAD_SPOOL_THRESHOLD = int(os.environ.get("UPLOAD_SPOOL_THRESHOLD", 2 * MB))
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR") or None
+
+
+class UploadLimitError(Exception):
+    """Upload exceeds a size or page-count limit (HTTP 413)"""
+
+
+class SpooledUpload:
+    """BytesIO until threshold bytes are written, then a named temp file"""
+
+    def __init__(self, threshold=UPLOAD_SPOOL_THRESHOLD):
+        self.threshold = threshold
+        self._file = BytesIO()
+        self.name = None
+
+    @property
+    def on_disk(self):
+        return self.name is not None
+
+    def write(self, data):
+        if not self.on_disk and self._file.tell() + len(data) > self.threshold:
+            self._rollover()
+        return self._file.write(data)
+
+    def _rollover(self):
+        disk = tempfile.NamedTemporaryFile(prefix="upload_", dir=UPLOAD_SPOOL_DIR)
+        disk.write(self._file.getbuffer())
+        disk.seek(self._file.tell())
+        self._file = disk
+        self.name = disk.name
+
+    def size(self):
+        if self.on_disk:
+            self._file.flush()
+            return os.fstat(self._file.fileno()).st_size
+        return self._file.getbuffer().nbytes
+
+    def __getattr__(self, attr):
+        return getattr(self._file, attr)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class SpooledRequest(Request):
+    """Flask request whose multipart files are SpooledUpload objects"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledUpload()
+
+
+def _spool(file):
+    stream = file.stream
+    return stream if isinstance(stream, SpooledUpload) else None
+
+
+def upload_size(file):
+    spool = _spool(file)
+    if spool is not None:
+        return spool.size()
+    pos = file.stream.tell()
+    file.stream.seek(0, os.SEEK_END)
+    size = file.stream.tell()
+    file.stream.seek(pos)
+    return size
+
+
+@contextmanager
+def upload_buffer(file):
+    """Read-only buffer over an upload: mmap when spooled to disk, else the in-memory bytes"""
+    spool = _spool(file)
+    if spool is not None and spool.on_disk:
+        spool.flush()
+        if spool.size() == 0:
+            yield b""
+            return
+        mm = mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
+    elif spool is not None:
+        yield spool.getbuffer()
+    else:
+        file.stream.seek(0)
+        yield file.stream.read()
+
+
+def decode_image(file, flags=None):
+    """cv2.imdecode straight from the upload buffer (no extra bytes copy)"""
+    import cv2
+    import numpy as np
+
+    if flags is None:
+        flags = cv2.IMREAD_COLOR
+    with upload_buffer(file) as buf:
+        if len(buf) == 0:
+            return None
+        return cv2.imdecode(np.frombuffer(buf, np.uint8), flags)
+
+
+def open_pdf(file, max_pages=None):
+    """Open an uploaded PDF with PyMuPDF, by path when spooled to disk"""
+    import fitz  # PyMuPDF
+
+    spool = _spool(file)
+    if spool is not None and spool.on_disk:
+        spool.flush()
+        doc = fitz.open(spool.name, filetype="pdf")
+    else:
+        with upload_buffer(file) as buf:
+            doc = fitz.open(stream=bytes(buf), filetype="pdf")
+
+    if max_pages is not None and len(doc) > max_pages:
+        count = len(doc)
+        doc.close()
+        raise UploadLimitError(f"PDF has {count} pages; the limit is {max_pages}")
+    observe_pages(len(doc))
+    return doc
+
+
+@contextmanager
+def upload_source(file):
+    """Path of an upload spooled to disk, else a BytesIO over its bytes;
+    for libraries that read a file themselves (pikepdf/qpdf)"""
+    spool = _spool(file)
+    if spool is not None and spool.on_disk:
+        spool.flush()
+        yield spool.name
+    else:
+        with upload_buffer(file) as buf:
+            yield BytesIO(buf)
+
+
+def safe_filename(filename, fallback):
+    """secure_filename that keeps the extension, which soffice uses to pick
+    the import filter; fallback replaces a name that sanitizes to nothing"""
+    stem, ext = os.path.splitext(filename or "")
+    ext = secure_filename(ext).lower()
+    stem = secure_filename(stem) or fallback
+    return f"{stem}.{ext}" if ext else stem
+
+
+def upload_limits(max_mb=None, max_files=None):
+    """Per-route limits checked before the multipart body is parsed"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if max_mb is not None and (request.content_length or 0) > max_mb * MB:
+                return jsonify({"error": f"Upload too large; the limit is {max_mb} MB"}), 413
+            if max_files is not None:
+                count = sum(len(request.files.getlist(k)) for k in request.files.keys())
+                if count > max_files:
+                    return jsonify({"error": f"Too many files; the limit is {max_files}"}), 413
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
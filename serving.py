@@ -0,0 +1,49 @@
+import os
+
+# Production serving profile. One gunicorn instance serves one pool of route
+# classes, selected with SERVING_POOL:
+#   ocr    - CPU-heavy OCR/OpenCV work: few processes, one thread each
+#   office - subprocess-bound LibreOffice/Ghostscript: threads wait on children
+#   pages  - fast page operations: many threads
+#   all    - every route in one instance (default, single-service deploys)
+# Deploying ocr/office/pages as separate services behind path-based routing
+# keeps one slow OCR request from queueing the fast page operations.
+
+CPU_COUNT = os.cpu_count() or 1
+
+POOL_MODULES = {
+    "ocr": ["scan_document", "ocr", "ocr_pdf", "pdfa_ocr", "edit_pdf"],
+    "office": ["word_to_pdf", "excel_to_pdf", "ppt_to_pdf", "compress"],
+    "pages": [
+        "merge_pdf", "split", "delete_pages", "extract_pages", "organize_pdf",
+        "rotate_pdf", "add_page_numbers", "add_watermark", "crop_pdf",
+        "compress_image", "image_to_pdf", "thumbnails", "inspect_pdf",
+    ],
+}
+POOL_MODULES["all"] = [m for pool in ("ocr", "office", "pages") for m in POOL_MODULES[pool]]
+
+POOL_SETTINGS = {
+    "ocr": {"workers": CPU_COUNT, "threads": 1, "timeout": 300, "max_requests": 200},
+    "office": {"workers": max(2, CPU_COUNT // 2), "threads": 4, "timeout": 180, "max_requests": 500},
+    "pages": {"workers": CPU_COUNT + 1, "threads": 8, "timeout": 60, "max_requests": 2000},
+    "all": {"workers": CPU_COUNT + 1, "threads": 4, "timeout": 300, "max_requests": 500},
+}
+
+SERVING_POOL = os.environ.get("SERVING_POOL", "all").lower()
+if SERVING_POOL not in POOL_SETTINGS:
+    raise RuntimeError(f"Unknown SERVING_POOL '{SERVING_POOL}'; expected one of {list(POOL_SETTINGS)}")
+
+
+def pool_modules(pool=SERVING_POOL):
+    """Route modules served by a pool"""
+    return POOL_MODULES[pool]
+
+
+def pool_settings(pool=SERVING_POOL):
+    """Gunicorn sizing for a pool; WEB_WORKERS/WEB_THREADS/WEB_TIMEOUT override"""
+    settings = dict(POOL_SETTINGS[pool])
+    for key, env in (("workers", "WEB_WORKERS"), ("threads", "WEB_THREADS"),
+                     ("timeout", "WEB_TIMEOUT"), ("max_requests", "WEB_MAX_REQUESTS")):
+        if os.environ.get(env):
+            settings[key] = int(os.environ[env])
+    return settings